@@ -1,38 +1,41 @@
-from fastapi import FastAPI
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+from starlette.routing import request_response
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Awaitable, Callable, Iterable, Optional, Tuple
+import asyncio
+import copy
+import importlib
 import os
+import orjson
+
+from core.config import settings
 
 # Import logging system
 from core.logging import setup_logging, get_logger, app_logger
 
 # Import Phase 7 enhancements
 from core.exceptions import setup_exception_handlers
-from core.middleware import setup_middleware
-
-# Import routers
-from routers import (
-    auth, quizzes, users, files, summaries, mcqs, communities, 
-    interactions, notifications, preferences, versioning, 
-    analytics, background_tasks, health, api_keys,tags
-)
+from core.file_utils import provision_upload_directories
+from core.middleware import HealthCheckMiddleware, setup_middleware
 
 # Initialize logging system early
 setup_logging()
 logger = get_logger("fastapi")
 
-# Create FastAPI app instance
-app = FastAPI(
-    title="Study Helper Backend API",
-    description="Backend API for the Study Helper application with AI-powered features",
-    version="0.1.0",
-    docs_url="/docs",
-    redoc_url="/redoc",
+# Router modules under routers/, in registration order. They are imported
+# lazily by create_app so that apps built with a subset only pay for those.
+ROUTER_MODULES = (
+    "auth", "users", "files", "summaries", "quizzes", "tags", "mcqs",
+    "communities", "interactions", "notifications", "preferences",
+    "versioning", "analytics", "background_tasks", "health", "api_keys",
 )
 
-# Setup global exception handlers
-setup_exception_handlers(app)
-
-# Setup security middleware
+# Security middleware configuration
 middleware_config = {
     "enable_security_headers": True,
     "enable_request_logging": True,
@@ -42,77 +45,162 @@ middleware_config = {
     "timeout_seconds": 300,  # 5 minutes
     "enable_ip_whitelist": False,  # Disabled by default
 }
-setup_middleware(app, middleware_config)
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure this properly for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include routers
-app.include_router(auth.router)
-app.include_router(users.router)
-app.include_router(files.router)
-app.include_router(summaries.router)
-app.include_router(quizzes.router)
-app.include_router(tags.router)
-app.include_router(mcqs.router)
-app.include_router(communities.router)
-app.include_router(interactions.router)
-app.include_router(notifications.router)
-app.include_router(preferences.router)
-app.include_router(versioning.router)
-app.include_router(analytics.router)
-app.include_router(background_tasks.router)
-app.include_router(health.router)
-app.include_router(api_keys.router)
 
+# Static payloads for the root and health endpoints, serialized once at import
+_HEALTH_BYTES = orjson.dumps(
+    {"status": "ok", "message": "Study Helper Backend API is running"}
+)
+_ROOT_BYTES = orjson.dumps(
+    {
+        "message": "Welcome to Study Helper Backend API",
+        "version": "0.1.0",
+        "docs": "/docs",
+        "redoc": "/redoc",
+        "health_checks": {
+            "basic": "/health",
+            "detailed": "/health/detailed",
+            "database": "/health/database",
+            "ai_services": "/health/ai-services",
+            "system": "/health/system"
+        }
+    }
+)
 
 
 # Enhanced health check endpoint (keep the simple one for backwards compatibility)
-@app.get("/health", tags=["Health"])
 async def health_check():
     """
     Basic health check endpoint to verify the API is running.
     """
-    logger.info("Health check endpoint accessed")
-    return {"status": "ok", "message": "Study Helper Backend API is running"}
+    logger.debug("Health check endpoint accessed")
+    return Response(content=_HEALTH_BYTES, media_type="application/json")
 
 
 # Root endpoint
-@app.get("/", tags=["Root"])
 async def root():
     """
     Root endpoint providing basic API information.
     """
-    logger.info("Root endpoint accessed")
-    return {
-        "message": "Welcome to Study Helper Backend API",
-        "version": "0.1.0",
-        "docs": "/docs",
-        "redoc": "/redoc",
-        "health_checks": {
-            "basic": "/health",
-            "detailed": "/health/detailed",
-            "database": "/health/database",
-            "ai_services": "/health/ai-services", 
-            "system": "/health/system"
-        }
-    }
-
-
-# Application lifecycle events
-@app.on_event("startup")
-async def startup_event():
-    """Handle application startup."""
-    app_logger.info("FastAPI application starting up", extra={"component": "startup"})
+    logger.debug("Root endpoint accessed")
+    return Response(content=_ROOT_BYTES, media_type="application/json")
+
+
+# Application lifecycle
+async def _provision_storage():
+    """Create the upload directories without blocking the event loop."""
+    await run_in_threadpool(provision_upload_directories)
+
+
+def add_startup_task(app: FastAPI, task: Callable[[], Awaitable[None]]):
+    """Register a coroutine function to run during application startup."""
+    app.state.startup_tasks.append(task)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Handle application startup and shutdown."""
+    app_logger.info("FastAPI application starting up")
+    # Startup tasks are independent, so run them concurrently
+    await asyncio.gather(*(task() for task in app.state.startup_tasks))
+    yield
+    app_logger.info("FastAPI application shutting down")
+
+
+@lru_cache(maxsize=None)
+def _build_root_router(names: Tuple[str, ...]) -> APIRouter:
+    """Import the router modules and combine them into one router, once per set."""
+    root_router = APIRouter(default_response_class=ORJSONResponse)
+    for name in names:
+        module = importlib.import_module(f"routers.{name}")
+        root_router.include_router(module.router)
+    return root_router
+
+
+def _register_routers(app: FastAPI, include: Optional[Iterable[str]] = None):
+    """Attach the router modules' routes to the app."""
+    if include is None:
+        names = ROUTER_MODULES
+    else:
+        include = set(include)
+        unknown = include.difference(ROUTER_MODULES)
+        if unknown:
+            raise ValueError(f"Unknown router modules: {', '.join(sorted(unknown))}")
+        names = tuple(name for name in ROUTER_MODULES if name in include)
+
+    root_router = _build_root_router(names)
+
+    # Attach shallow copies of the prebuilt routes rather than calling
+    # app.include_router, which re-analyses every endpoint for each new app.
+    # Each copy gets a request handler bound to this app so that
+    # app.dependency_overrides still applies.
+    for route in root_router.routes:
+        if isinstance(route, APIRoute):
+            route = copy.copy(route)
+            route.dependency_overrides_provider = app
+            route.app = request_response(route.get_route_handler())
+        app.router.routes.append(route)
+
+
+def create_app(include: Optional[Iterable[str]] = None) -> FastAPI:
+    """
+    Create and configure a FastAPI application.
 
+    Args:
+        include: Optional names from ROUTER_MODULES to mount. All routers are
+            mounted by default; tests can pass a subset to skip importing the rest.
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Handle application shutdown."""
-    app_logger.info("FastAPI application shutting down", extra={"component": "shutdown"})
+    Returns:
+        FastAPI: The configured application
+    """
+    # Create FastAPI app instance
+    app = FastAPI(
+        title="Study Helper Backend API",
+        description="Backend API for the Study Helper application with AI-powered features",
+        version="0.1.0",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        default_response_class=ORJSONResponse,
+        lifespan=lifespan,
+    )
+    app.state.startup_tasks = [_provision_storage]
+
+    # Setup global exception handlers
+    setup_exception_handlers(app)
+
+    # Setup security middleware
+    setup_middleware(app, middleware_config)
+
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.cors_allowed_origins,  # Configure this properly for production
+        allow_credentials=settings.cors_allow_credentials,
+        allow_methods=settings.cors_allowed_methods,
+        allow_headers=settings.cors_allowed_headers,
+    )
+
+    # Answer load balancer health checks ahead of every other middleware
+    app.add_middleware(HealthCheckMiddleware, path="/health", body=_HEALTH_BYTES)
+
+    # Include routers
+    _register_routers(app, include)
+
+    app.add_api_route(
+        "/health", health_check, methods=["GET"], tags=["Health"], response_model=None
+    )
+    app.add_api_route(
+        "/", root, methods=["GET"], tags=["Root"], response_model=None
+    )
+
+    return app
+
+
+def __getattr__(name: str):
+    # Build the default application on first access to ``app.app`` (uvicorn
+    # "app:app", ``from app import app``) rather than at import time, so that
+    # importing create_app alone does not import every router.
+    if name == "app":
+        application = create_app()
+        globals()["app"] = application
+        return application
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,8 +1,8 @@
 """
 Application configuration using Pydantic settings.
 """
-import os
-from pydantic_settings import BaseSettings
+from functools import cached_property, lru_cache
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 
@@ -16,11 +16,34 @@ class Settings(BaseSettings):
     db_password: str = "password"
     db_name: str = "dbname"
     
+    # Connection pool: "queue" keeps up to db_pool_size idle connections per
+    # engine; "null" opens one per checkout (for serverless/short-lived workers)
+    db_pool_mode: str = "queue"
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30  # Seconds to wait for a free connection
+    
     # JWT settings
     jwt_secret_key: str = "change-this-in-production"
     jwt_algorithm: str = "HS256"
     jwt_access_token_expire_minutes: int = 30
     
+    # Password hashing cost (log2 rounds); aim for ~250ms per hash on the
+    # production hardware
+    bcrypt_rounds: int = 12
+    bcrypt_workers: Optional[int] = None  # Parallel hashes; defaults to the CPU count
+    # Seconds a successful password check is remembered, so repeated logins
+    # with the same password and hash skip bcrypt (0 disables it). Failed
+    # checks are never remembered, and a new hash never matches an old entry.
+    password_cache_ttl_seconds: int = 60
+    
+    # Seconds a worker may reuse a token's authentication without checking
+    # the session and user rows again (0 disables it). Revocations made
+    # through another worker process, such as a logout or deactivation, are
+    # only seen once the entry expires, so keep this at 0 with more than one
+    # worker.
+    auth_cache_ttl_seconds: int = 0
+    
     # AI settings
     gemini_api_key: Optional[str] = None
     openai_api_key: Optional[str] = None
@@ -110,6 +133,20 @@ class Settings(BaseSettings):
     max_request_size_bytes: int = 50 * 1024 * 1024  # 50MB
     request_timeout_seconds: int = 300  # 5 minutes
     
+    # Rate limiting backend: "memory" (per process) or "redis" (shared by
+    # all workers, needs the redis package)
+    rate_limit_backend: str = "memory"
+    redis_host: str = "localhost"
+    redis_port: int = 6379
+    redis_password: Optional[str] = None
+    
+    # CORS settings. Auth uses bearer tokens rather than cookies, so credentials
+    # are off by default, which lets a wildcard origin be answered with a static "*"
+    cors_allowed_origins: list[str] = ["*"]
+    cors_allow_credentials: bool = False
+    cors_allowed_methods: list[str] = ["GET", "POST", "PUT", "PATCH", "DELETE"]
+    cors_allowed_headers: list[str] = ["Authorization", "Content-Type"]
+    
     # Monitoring settings
     enable_health_checks: bool = True
     enable_metrics: bool = True
@@ -120,22 +157,27 @@ class Settings(BaseSettings):
     task_cleanup_interval_minutes: int = 60
     task_retention_days: int = 7
     
-    @property
+    @cached_property
     def database_url(self) -> str:
         """Construct database URL from individual components."""
         return f"postgresql://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
-
+    # Settings are read-only once loaded
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, frozen=True)
 
-# Global settings instance
-settings = Settings()
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the application settings, loading them on first use."""
+    return Settings()
 
-# Gemini AI Configuration Constants (using settings values)
-GEMINI_MODEL = settings.gemini_model
 
-# Create upload directory if it doesn't exist
-os.makedirs(settings.upload_directory, exist_ok=True)
+def __getattr__(name: str):
+    # ``from core.config import settings`` still builds the settings as soon
+    # as the importing module loads; only core.config itself defers it
+    if name == "settings":
+        return get_settings()
+    # Gemini AI Configuration Constants (using settings values)
+    if name == "GEMINI_MODEL":
+        return get_settings().gemini_model
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
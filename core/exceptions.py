@@ -1,18 +1,37 @@
 """
 Global exception handlers for the FastAPI application.
 """
+import logging
 import traceback
-from typing import Union
-from fastapi import Request, HTTPException, status
-from fastapi.responses import JSONResponse
+from functools import lru_cache
+from typing import Any, Dict, Union
+import orjson
+from fastapi import Request, Response, HTTPException, status
 from fastapi.exceptions import RequestValidationError
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from pydantic import ValidationError
 import structlog
 
+# structlog is configured with cache_logger_on_first_use (see core.logging), so
+# this proxy resolves its bound logger once instead of on every call
 logger = structlog.get_logger("exceptions")
 
 
+def _request_context(request: Request) -> Dict[str, Any]:
+    """Collect the request fields logged by every handler, straight from the ASGI scope."""
+    scope = request.scope
+    path = scope["path"]
+    query_string = scope.get("query_string")
+    if query_string:
+        path = f"{path}?{query_string.decode('latin-1')}"
+    client = scope.get("client")
+    return {
+        "path": path,
+        "method": scope["method"],
+        "client_host": client[0] if client else None,
+    }
+
+
 class APIException(Exception):
     """Base API exception class."""
     
@@ -101,87 +120,93 @@ class AIServiceException(APIException):
         self.provider = provider
 
 
-async def api_exception_handler(request: Request, exc: APIException) -> JSONResponse:
+@lru_cache(maxsize=256)
+def _error_body(error_type: str, message: str, status_code: int) -> bytes:
+    """Serialize an error envelope with a plain string message, once per distinct error."""
+    return orjson.dumps(
+        {"error": {"type": error_type, "message": message, "status_code": status_code}}
+    )
+
+
+def error_response(
+    error_type: str,
+    message: Any,
+    status_code: int,
+    headers: dict = None,
+    details: Any = None
+) -> Response:
+    """
+    Build the standard error response.
+    
+    The body is serialized straight to bytes with orjson; bodies for string
+    messages without details are cached, since the same few errors
+    (bad credentials, not found, ...) make up most error traffic.
+    """
+    if details is None and isinstance(message, str):
+        body = _error_body(error_type, message, status_code)
+    else:
+        error = {"type": error_type, "message": message, "status_code": status_code}
+        if details is not None:
+            error["details"] = details
+        body = orjson.dumps({"error": error}, option=orjson.OPT_NON_STR_KEYS)
+    
+    return Response(
+        content=body,
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json"
+    )
+
+
+async def api_exception_handler(request: Request, exc: APIException) -> Response:
     """Handle custom API exceptions."""
     logger.error(
         "API exception occurred",
         exception_type=type(exc).__name__,
         status_code=exc.status_code,
         detail=exc.detail,
-        path=str(request.url),
-        method=request.method,
-        client_host=request.client.host if request.client else None
+        **_request_context(request)
     )
     
-    return JSONResponse(
-        status_code=exc.status_code,
-        content={
-            "error": {
-                "type": type(exc).__name__,
-                "message": exc.detail,
-                "status_code": exc.status_code
-            }
-        },
-        headers=exc.headers
-    )
+    return error_response(type(exc).__name__, exc.detail, exc.status_code, headers=exc.headers)
 
 
-async def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
+async def http_exception_handler(request: Request, exc: HTTPException) -> Response:
     """Handle FastAPI HTTP exceptions."""
     logger.warning(
         "HTTP exception occurred",
         status_code=exc.status_code,
         detail=exc.detail,
-        path=str(request.url),
-        method=request.method,
-        client_host=request.client.host if request.client else None
+        **_request_context(request)
     )
     
-    return JSONResponse(
-        status_code=exc.status_code,
-        content={
-            "error": {
-                "type": "HTTPException",
-                "message": exc.detail,
-                "status_code": exc.status_code
-            }
-        },
-        headers=exc.headers
-    )
+    return error_response("HTTPException", exc.detail, exc.status_code, headers=exc.headers)
 
 
-async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
+async def validation_exception_handler(request: Request, exc: RequestValidationError) -> Response:
     """Handle request validation errors."""
+    errors = exc.errors()
     logger.warning(
         "Validation error occurred",
-        errors=exc.errors(),
-        path=str(request.url),
-        method=request.method,
-        client_host=request.client.host if request.client else None
+        errors=errors,
+        **_request_context(request)
     )
     
-    return JSONResponse(
-        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content={
-            "error": {
-                "type": "ValidationError",
-                "message": "Request validation failed",
-                "status_code": status.HTTP_422_UNPROCESSABLE_ENTITY,
-                "details": exc.errors()
-            }
-        }
+    return error_response(
+        "ValidationError",
+        "Request validation failed",
+        status.HTTP_422_UNPROCESSABLE_ENTITY,
+        details=errors
     )
 
 
-async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError) -> JSONResponse:
+async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError) -> Response:
     """Handle SQLAlchemy database exceptions."""
     logger.error(
         "Database error occurred",
         exception_type=type(exc).__name__,
         error_detail=str(exc),
-        path=str(request.url),
-        method=request.method,
-        client_host=request.client.host if request.client else None
+        **_request_context(request)
     )
     
     # Handle specific database errors
@@ -192,39 +217,24 @@ async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError) -
         detail = "Database operation failed"
         status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
     
-    return JSONResponse(
-        status_code=status_code,
-        content={
-            "error": {
-                "type": "DatabaseError",
-                "message": detail,
-                "status_code": status_code
-            }
-        }
-    )
+    return error_response("DatabaseError", detail, status_code)
 
 
-async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+async def general_exception_handler(request: Request, exc: Exception) -> Response:
     """Handle all other uncaught exceptions."""
-    logger.error(
-        "Unhandled exception occurred",
-        exception_type=type(exc).__name__,
-        error_detail=str(exc),
-        traceback=traceback.format_exc(),
-        path=str(request.url),
-        method=request.method,
-        client_host=request.client.host if request.client else None
-    )
+    if logger.is_enabled_for(logging.ERROR):
+        logger.error(
+            "Unhandled exception occurred",
+            exception_type=type(exc).__name__,
+            error_detail=str(exc),
+            traceback=traceback.format_exc(),
+            **_request_context(request)
+        )
     
-    return JSONResponse(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content={
-            "error": {
-                "type": "InternalServerError",
-                "message": "An unexpected error occurred",
-                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR
-            }
-        }
+    return error_response(
+        "InternalServerError",
+        "An unexpected error occurred",
+        status.HTTP_500_INTERNAL_SERVER_ERROR
     )
 
 
@@ -4,15 +4,99 @@ Utilities for file handling operations.
 import os
 import hashlib
 import shutil
-from typing import Optional, Tuple
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Tuple
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 from core.config import settings
 
+# Copy uploads in 256 KiB chunks (same buffer size as hashlib.file_digest)
+# so large files never sit in memory at once
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+# Upload limits resolved once from settings
+ALLOWED_EXTENSIONS = frozenset(ext.lower() for ext in settings.allowed_file_types)
+MAX_FILE_SIZE_BYTES = settings.max_file_size_mb * 1024 * 1024
+
+# Mode open(path, "wb") would give a new file under the process umask. The
+# umask can only be read by setting it, so do that once at import.
+_umask = os.umask(0)
+os.umask(_umask)
+UPLOAD_FILE_MODE = 0o666 & ~_umask
+
+
+def _copy_and_hash(src: BinaryIO, dst: BinaryIO) -> Tuple[str, int]:
+    """
+    Copy src to dst in chunks, hashing the data on the way through.
+    
+    Chunks are read into a single reused buffer and passed on as memoryview
+    slices, so no bytes object is allocated per chunk. hashlib releases the
+    GIL while digesting large chunks, so this is meant to run in a worker thread.
+    
+    Returns:
+        Tuple containing (sha256 hex digest, number of bytes copied)
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    buffer = bytearray(UPLOAD_CHUNK_SIZE)
+    with memoryview(buffer) as view:
+        while n := src.readinto(buffer):
+            chunk = view[:n]
+            hasher.update(chunk)
+            dst.write(chunk)
+            size += n
+    return hasher.hexdigest(), size
+
+
+def _write_upload(src: BinaryIO, upload_dir: str, file_extension: str) -> Tuple[str, str, int]:
+    """
+    Write an upload stream to its content-addressed path in upload_dir.
+    
+    Blocking; run it in a worker thread.
+    
+    Returns:
+        Tuple containing (file_path, file_hash, file_size)
+    """
+    # The upload directory is provisioned at startup; only create it here
+    # if it is missing (new subfolder, or removed while running)
+    try:
+        tmp = tempfile.NamedTemporaryFile(dir=upload_dir, suffix=".part", delete=False)
+    except FileNotFoundError:
+        os.makedirs(upload_dir, exist_ok=True)
+        tmp = tempfile.NamedTemporaryFile(dir=upload_dir, suffix=".part", delete=False)
+    
+    # Stream file content to a temporary file while calculating the hash
+    try:
+        with tmp:
+            file_hash, file_size = _copy_and_hash(src, tmp)
+        # NamedTemporaryFile creates the file as 0600; give it the usual mode
+        os.chmod(tmp.name, UPLOAD_FILE_MODE)
+        
+        # Use hash as part of filename to avoid collisions
+        file_path = os.path.join(upload_dir, f"{file_hash}{file_extension}")
+        
+        # Move the file into place atomically
+        os.replace(tmp.name, file_path)
+    except BaseException:
+        # Don't leave partial uploads behind
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+        raise
+    
+    return file_path, file_hash, file_size
+
 
 async def save_upload_file(upload_file: UploadFile, subfolder: str = "") -> Tuple[str, str, int, str]:
     """
     Save an uploaded file to disk and return its metadata.
     
+    The upload is streamed to a temporary file in fixed-size chunks while it is
+    hashed, then renamed to its content-addressed name, so memory use stays
+    bounded regardless of the file size. All filesystem work happens in a
+    single worker thread so the event loop is never blocked on disk I/O.
+    The upload stream is consumed.
+    
     Args:
         upload_file: The uploaded file from FastAPI
         subfolder: Optional subfolder within the upload directory
@@ -20,33 +104,37 @@ async def save_upload_file(upload_file: UploadFile, subfolder: str = "") -> Tupl
     Returns:
         Tuple containing (file_path, file_hash, file_size, mime_type)
     """
-    # Create upload directory if it doesn't exist
     upload_dir = settings.upload_directory
     if subfolder:
         upload_dir = os.path.join(upload_dir, subfolder)
-    os.makedirs(upload_dir, exist_ok=True)
     
-    # Get file content and calculate hash
-    content = await upload_file.read()
-    file_hash = hashlib.sha256(content).hexdigest()
-    file_size = len(content)
-    
-    # Use hash as part of filename to avoid collisions
     file_extension = os.path.splitext(upload_file.filename)[1].lower()
-    safe_filename = f"{file_hash}{file_extension}"
-    file_path = os.path.join(upload_dir, safe_filename)
-    
-    # Write file to disk
-    with open(file_path, "wb") as f:
-        f.write(content)
     
-    # Reset file pointer for potential further processing
     await upload_file.seek(0)
+    file_path, file_hash, file_size = await run_in_threadpool(
+        _write_upload, upload_file.file, upload_dir, file_extension
+    )
     
     return file_path, file_hash, file_size, upload_file.content_type
 
 
 
+def provision_upload_directories(subfolders: Iterable[str] = ()) -> None:
+    """
+    Create the upload directory and any known subfolders.
+    
+    Called once at application startup so uploads don't need to check for
+    the directory on every request.
+    
+    Args:
+        subfolders: Optional subfolders within the upload directory
+    """
+    upload_dir = Path(settings.upload_directory)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    for subfolder in subfolders:
+        (upload_dir / subfolder).mkdir(parents=True, exist_ok=True)
+
+
 def delete_file(file_path: str) -> bool:
     """
     Delete a file from disk.
@@ -58,12 +146,10 @@ def delete_file(file_path: str) -> bool:
         bool: True if deletion was successful, False otherwise
     """
     try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            return True
-        return False
-    except Exception as e:
-        # Log the error
+        os.unlink(file_path)
+        return True
+    except OSError:
+        # Missing file or no permission
         return False
 
 
@@ -77,8 +163,8 @@ def validate_file_type(filename: str) -> bool:
     Returns:
         bool: True if file type is allowed, False otherwise
     """
-    ext = os.path.splitext(filename)[1].lower()
-    return ext in settings.allowed_file_types
+    dot = filename.rfind(".")
+    return dot > 0 and filename[dot:].lower() in ALLOWED_EXTENSIONS
 
 
 def validate_file_size(file_size: int) -> bool:
@@ -91,5 +177,4 @@ def validate_file_size(file_size: int) -> bool:
     Returns:
         bool: True if file size is allowed, False otherwise
     """
-    max_size_bytes = settings.max_file_size_mb * 1024 * 1024
-    return file_size <= max_size_bytes 
\ No newline at end of file
+    return file_size <= MAX_FILE_SIZE_BYTES 
\ No newline at end of file
@@ -1,158 +1,341 @@
 """
 Centralized logging system with rotating file handlers, compression, and singleton pattern.
 """
+import atexit
 import sys
 import os
+import re
 import logging
 import logging.handlers
-import gzip
-import shutil
+import queue
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Tuple, Union
 from datetime import datetime
-from pythonjsonlogger import jsonlogger
+import orjson
+import structlog
+import zstandard as zstd
 from core.config import settings
 
 
-class ComponentFilter(logging.Filter):
-    """Filter to ensure all log records have a component field."""
+def _orjson_dumps(obj: Any, **kwargs) -> str:
+    """JSON serializer for structlog's JSONRenderer backed by orjson."""
+    return orjson.dumps(obj, **kwargs).decode()
+
+
+# Rotated log files are compressed with zstd, which is considerably faster than
+# gzip at a better ratio on text logs
+COMPRESSED_SUFFIX = ".zst"
+_COMPRESSION_LEVEL = 3
+_COMPRESSION_IO_SIZE = 256 * 1024
+
+
+def _compress_file(path: str) -> str:
+    """Compress ``path`` to ``path + COMPRESSED_SUFFIX`` and remove the original."""
+    compressed_file = f"{path}{COMPRESSED_SUFFIX}"
+    partial_file = f"{compressed_file}.part"
+    cctx = zstd.ZstdCompressor(level=_COMPRESSION_LEVEL, threads=-1)
+    with open(path, 'rb') as f_in, open(partial_file, 'wb') as f_out:
+        cctx.copy_stream(
+            f_in, f_out,
+            read_size=_COMPRESSION_IO_SIZE,
+            write_size=_COMPRESSION_IO_SIZE
+        )
+    # Only a complete archive ever appears under the final name
+    os.replace(partial_file, compressed_file)
+    os.remove(path)
+    return compressed_file
+
+
+# Rollovers hand compression to this single worker so that log writes resume
+# as soon as the file has been renamed. One worker keeps jobs in order.
+_compression_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-compress")
+
+
+def _wait_for_compression():
+    """Block until every compression job submitted so far has finished."""
+    try:
+        _compression_executor.submit(lambda: None).result()
+    except RuntimeError:
+        # The executor is already shut down (interpreter exit), which itself
+        # waits for the pending jobs
+        pass
+
+
+# Component shown for a log record, keyed by logger name. Structured loggers
+# register their own name; other loggers are resolved on first use.
+_COMPONENT_MAP: Dict[str, str] = {
+    'httpx': 'http',
+    'uvicorn': 'http',
+    'uvicorn.access': 'http',
+}
+_DATABASE_LOGGER_PREFIXES = ('sqlalchemy', 'alembic')
+
+
+def _component_for(logger_name: str) -> str:
+    """Resolve the component for a logger name, caching the result."""
+    component = _COMPONENT_MAP.get(logger_name)
+    if component is None:
+        component = 'database' if logger_name.startswith(_DATABASE_LOGGER_PREFIXES) else 'unknown'
+        _COMPONENT_MAP[logger_name] = component
+    return component
+
+
+def _set_component(record: logging.LogRecord):
+    """Fill in the record's component unless the caller passed one in extra."""
+    if 'component' not in record.__dict__:
+        record.component = _component_for(record.name)
+
+
+class CachedTimeFormatter(logging.Formatter):
+    """Formatter that renders ``asctime`` at most once per second."""
     
-    def __init__(self, default_component: str = "unknown"):
-        super().__init__()
-        self.default_component = default_component
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_time = (None, "")
     
-    def filter(self, record):
-        """Add component field if missing."""
-        if not hasattr(record, 'component'):
-            # Try to infer component from logger name
-            logger_name = record.name
-            if logger_name in ['httpx', 'uvicorn', 'uvicorn.access']:
-                record.component = 'http'
-            elif logger_name.startswith('sqlalchemy'):
-                record.component = 'database'
-            elif logger_name.startswith('alembic'):
-                record.component = 'database'
-            else:
-                record.component = self.default_component
-        return True
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        """Format the record time, reusing the string rendered for the same second."""
+        if datefmt is None:
+            # The default format includes milliseconds
+            return super().formatTime(record, datefmt)
+        
+        second = int(record.created)
+        cached_second, formatted = self._cached_time
+        if cached_second != second:
+            formatted = time.strftime(datefmt, self.converter(second))
+            self._cached_time = (second, formatted)
+        return formatted
+    
+    def format(self, record: logging.LogRecord) -> str:
+        """Format the record, resolving its component on the way."""
+        _set_component(record)
+        return super().format(record)
+
+
+class PrebuiltJsonFormatter(CachedTimeFormatter):
+    """
+    JSON formatter that resolves its field list only once.
+    
+    The fields named in ``fmt`` (``%(name)s`` style) are parsed at construction.
+    Formatting a record collects their values and encodes the whole line with a
+    single orjson call, which writes straight into one output buffer instead of
+    producing a bytes object per field to be joined afterwards.
+    """
+    
+    FIELD_PATTERN = re.compile(r'%\((\w+)\)')
+    
+    def __init__(self, fmt: str, datefmt: Optional[str] = None):
+        super().__init__(fmt=fmt, datefmt=datefmt)
+        self._fields = tuple(self.FIELD_PATTERN.findall(fmt))
+        self._uses_time = 'asctime' in self._fields
+    
+    def format(self, record: logging.LogRecord) -> str:
+        """Format the record as a single JSON object."""
+        _set_component(record)
+        record.message = record.getMessage()
+        if self._uses_time:
+            record.asctime = self.formatTime(record, self.datefmt)
+        
+        log_record = {field: getattr(record, field, None) for field in self._fields}
+        
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            log_record['exc_info'] = record.exc_text
+        if record.stack_info:
+            log_record['stack_info'] = self.formatStack(record.stack_info)
+        
+        return orjson.dumps(log_record, default=str).decode()
 
 
 class SecurityFilter(logging.Filter):
     """Filter to remove sensitive information from logs."""
     
-    SENSITIVE_KEYS = {
+    # Lower-case names; dict keys are lower-cased before matching
+    SENSITIVE_KEYS = frozenset({
         'password', 'token', 'secret', 'key', 'api_key', 
         'authorization', 'auth', 'credential', 'pass',
         'jwt', 'bearer', 'session'
-    }
+    })
+    # All sensitive names as one alternation, so a key is scanned in a single pass
+    SENSITIVE_KEY_PATTERN = re.compile('|'.join(map(re.escape, sorted(SENSITIVE_KEYS))))
+    # Keys shorter than the shortest name cannot contain any of them
+    SENSITIVE_KEY_MIN_LENGTH = min(map(len, SENSITIVE_KEYS))
+    
+    # Patterns compiled once rather than looked up in the re cache per record.
+    # They are kept as separate passes on purpose: JWT_PATTERN and
+    # URL_CREDENTIALS_PATTERN start with literals that the re engine scans for
+    # directly, an optimisation it loses once they are joined in one alternation.
+    API_KEY_PATTERN = re.compile(r'\b[A-Za-z0-9]{32,}\b')
+    JWT_PATTERN = re.compile(r'Bearer\s+[A-Za-z0-9\-_=]+\.[A-Za-z0-9\-_=]+\.[A-Za-z0-9\-_=]+')
+    URL_CREDENTIALS_PATTERN = re.compile(r'://[^:]+:[^@]+@')
     
     def filter(self, record):
         """Filter sensitive information from log records."""
+        # Handlers only run their filters on records at or above their own
+        # level, but the same record reaches several handlers (console, app,
+        # error, ...). Sanitize it once and let the other handlers skip it.
+        if getattr(record, '_sanitized', False):
+            return True
+        
         if hasattr(record, 'msg') and isinstance(record.msg, str):
             record.msg = self._sanitize_message(record.msg)
         
-        if hasattr(record, 'args') and record.args:
-            record.args = tuple(self._sanitize_value(arg) for arg in record.args)
+        args = getattr(record, 'args', None)
+        if args:
+            if isinstance(args, dict):
+                # A single mapping argument, used with %(name)s style messages
+                record.args = self._sanitize_value(args)
+            elif any(isinstance(arg, (str, dict)) for arg in args):
+                # Only rebuild the tuple when some argument can need sanitizing
+                record.args = tuple(self._sanitize_value(arg) for arg in args)
         
+        record._sanitized = True
         return True
     
     def _sanitize_message(self, message: str) -> str:
         """Sanitize message content."""
-        import re
+        # Each pattern is only run when a cheap substring check shows it could match
         
         # Hide potential API keys (long alphanumeric strings)
-        message = re.sub(r'\b[A-Za-z0-9]{32,}\b', '[REDACTED]', message)
+        if len(message) >= 32:
+            message = self.API_KEY_PATTERN.sub('[REDACTED]', message)
         
         # Hide potential JWT tokens
-        message = re.sub(
-            r'Bearer\s+[A-Za-z0-9\-_=]+\.[A-Za-z0-9\-_=]+\.[A-Za-z0-9\-_=]+',
-            'Bearer [REDACTED]',
-            message
-        )
+        if 'Bearer' in message:
+            message = self.JWT_PATTERN.sub('Bearer [REDACTED]', message)
         
         # Hide passwords in URLs
-        message = re.sub(r'://[^:]+:[^@]+@', '://[REDACTED]:[REDACTED]@', message)
+        if '://' in message and '@' in message:
+            message = self.URL_CREDENTIALS_PATTERN.sub('://[REDACTED]:[REDACTED]@', message)
         
         return message
     
+    def _is_sensitive_key(self, key: Any) -> bool:
+        """Check a dict key against the sensitive names."""
+        return (
+            isinstance(key, str)
+            and len(key) >= self.SENSITIVE_KEY_MIN_LENGTH
+            and self.SENSITIVE_KEY_PATTERN.search(key.lower()) is not None
+        )
+    
     def _sanitize_value(self, value: Any) -> Any:
         """Sanitize a single value."""
         if isinstance(value, str):
             return self._sanitize_message(value)
         elif isinstance(value, dict):
-            return {
-                k: '[REDACTED]' if any(sensitive in k.lower() for sensitive in self.SENSITIVE_KEYS) else v
-                for k, v in value.items()
-            }
+            sensitive_keys = [k for k in value if self._is_sensitive_key(k)]
+            if not sensitive_keys:
+                # Nothing to hide; hand back the original rather than a copy
+                return value
+            redacted = dict(value)
+            for k in sensitive_keys:
+                redacted[k] = '[REDACTED]'
+            return redacted
         return value
 
 
-class CompressedTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
-    """Custom timed rotating file handler that compresses old log files."""
+class _BatchedFlushMixin:
+    """
+    Optionally defer the flush StreamHandler.emit does after every record.
     
-    def __init__(self, *args, **kwargs):
-        self.compress_logs = kwargs.pop('compress_logs', settings.log_compression)
-        super().__init__(*args, **kwargs)
+    With ``batch_flush`` set, records collect in the file object's buffer and
+    reach the disk in larger writes; whoever drives the handler calls
+    ``flush_batch`` once it has nothing more to write for the moment.
+    """
+    
+    batch_flush = False
+    
+    def flush(self):
+        if not self.batch_flush:
+            super().flush()
+    
+    def flush_batch(self):
+        """Write out everything buffered so far."""
+        super().flush()
+
+
+class _BatchingQueueListener(logging.handlers.QueueListener):
+    """Queue listener that flushes batching handlers whenever the queue runs dry."""
+    
+    def dequeue(self, block):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            if not block:
+                raise
+        for handler in self.handlers:
+            if isinstance(handler, _BatchedFlushMixin):
+                handler.flush_batch()
+        return self.queue.get(block)
+
+
+class _CompressingRotationMixin:
+    """
+    Rotation hooks shared by the compressing file handlers.
+    
+    Backups are named with COMPRESSED_SUFFIX, so the stock rollover shifts
+    and prunes the compressed archives itself. ``rotate`` only renames the
+    live file aside and hands the compression to the background worker.
+    """
+    
+    def _init_compression(self, compress_logs: bool):
+        self.compress_logs = compress_logs
+        self._pending_compression = None
     
     def doRollover(self):
-        """Override to add compression of rotated files."""
+        """Rotate the log file, waiting for the previous backup to be compressed."""
+        if self._pending_compression is not None:
+            # Only blocks when rollovers come faster than compression
+            self._pending_compression.result()
+            self._pending_compression = None
         super().doRollover()
-        
+    
+    def rotation_filename(self, default_name: str) -> str:
+        """Name backups after the compressed file they end up as."""
+        name = super().rotation_filename(default_name)
         if self.compress_logs:
-            # Find the most recent backup file
-            backup_file = None
-            for i in range(1, self.backupCount + 1):
-                potential_backup = f"{self.baseFilename}.{self.suffix}.{i}"
-                if os.path.exists(potential_backup):
-                    backup_file = potential_backup
-                    break
-            
-            if backup_file and os.path.exists(backup_file):
-                compressed_file = f"{backup_file}.gz"
-                try:
-                    with open(backup_file, 'rb') as f_in:
-                        with gzip.open(compressed_file, 'wb') as f_out:
-                            shutil.copyfileobj(f_in, f_out)
-                    os.remove(backup_file)
-                except Exception as e:
-                    # If compression fails, keep the original file
-                    print(f"Warning: Failed to compress log file {backup_file}: {e}")
+            name += COMPRESSED_SUFFIX
+        return name
+    
+    def rotate(self, source: str, dest: str):
+        """Move the live file aside and compress it in the background."""
+        if not os.path.exists(source):
+            return
+        if not self.compress_logs:
+            os.replace(source, dest)
+            return
+        
+        backup_file = dest[:-len(COMPRESSED_SUFFIX)]
+        os.replace(source, backup_file)
+        self._pending_compression = _compression_executor.submit(self._compress_backup, backup_file)
+    
+    @staticmethod
+    def _compress_backup(backup_file: str):
+        """Compress a rotated file, keeping the original if that fails."""
+        try:
+            _compress_file(backup_file)
+        except Exception as e:
+            print(f"Warning: Failed to compress log file {backup_file}: {e}")
 
 
-class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
-    """Custom rotating file handler that compresses old log files."""
+class CompressedTimedRotatingFileHandler(_BatchedFlushMixin, _CompressingRotationMixin, logging.handlers.TimedRotatingFileHandler):
+    """Custom timed rotating file handler that compresses old log files."""
     
     def __init__(self, *args, **kwargs):
-        self.compress_logs = kwargs.pop('compress_logs', settings.log_compression)
+        self._init_compression(kwargs.pop('compress_logs', settings.log_compression))
         super().__init__(*args, **kwargs)
+
+
+class CompressedRotatingFileHandler(_BatchedFlushMixin, _CompressingRotationMixin, logging.handlers.RotatingFileHandler):
+    """Custom rotating file handler that compresses old log files."""
     
-    def doRollover(self):
-        """Override to add compression of rotated files."""
-        super().doRollover()
-        
-        if self.compress_logs and self.backupCount > 0:
-            # Compress the most recent backup file
-            backup_file = f"{self.baseFilename}.1"
-            if os.path.exists(backup_file):
-                compressed_file = f"{backup_file}.gz"
-                try:
-                    with open(backup_file, 'rb') as f_in:
-                        with gzip.open(compressed_file, 'wb') as f_out:
-                            shutil.copyfileobj(f_in, f_out)
-                    os.remove(backup_file)
-                    
-                    # Rename existing compressed files
-                    for i in range(2, self.backupCount + 1):
-                        old_compressed = f"{self.baseFilename}.{i}.gz"
-                        new_compressed = f"{self.baseFilename}.{i+1}.gz"
-                        if os.path.exists(old_compressed):
-                            if os.path.exists(new_compressed):
-                                os.remove(new_compressed)
-                            os.rename(old_compressed, new_compressed)
-                except Exception as e:
-                    # If compression fails, keep the original file
-                    print(f"Warning: Failed to compress log file {backup_file}: {e}")
+    def __init__(self, *args, **kwargs):
+        self._init_compression(kwargs.pop('compress_logs', settings.log_compression))
+        super().__init__(*args, **kwargs)
 
 
 class StructuredLogger:
@@ -162,33 +345,36 @@ class StructuredLogger:
         self.name = name
         self._logger = logger
         self._name = name  # For compatibility with existing code
-    
-    def _format_message(self, msg: str, **kwargs) -> str:
-        """Format message with structured data."""
-        if not kwargs:
-            return msg
+        _COMPONENT_MAP[name] = name
         
+        # Pick the message formatter once rather than checking the format per call
         if settings.log_format == "json":
-            # For JSON format, structured data will be handled by the formatter
-            return msg
+            self._format_message = self._format_json
         else:
-            # For text format, append structured data to message
-            structured_parts = []
-            for key, value in kwargs.items():
-                structured_parts.append(f"{key}={value}")
-            
-            if structured_parts:
-                return f"{msg} [{', '.join(structured_parts)}]"
+            self._format_message = self._format_text
+    
+    @staticmethod
+    def _format_json(msg: str, **kwargs) -> str:
+        """Format message for JSON output; structured data is handled by the formatter."""
+        return msg
+    
+    @staticmethod
+    def _format_text(msg: str, **kwargs) -> str:
+        """Format message for text output by appending structured data."""
+        if not kwargs:
             return msg
+        structured = ", ".join(f"{key}={value}" for key, value in kwargs.items())
+        return f"{msg} [{structured}]"
+    
+    def isEnabledFor(self, level: int) -> bool:
+        """Check whether a message at this level would be logged."""
+        return self._logger.isEnabledFor(level)
     
     def _log(self, level: int, msg: str, *args, **kwargs):
-        """Internal logging method."""
+        """Internal logging method; callers check isEnabledFor(level) first."""
         # Extract logging-specific kwargs
         exc_info = kwargs.pop('exc_info', False)
-        extra = kwargs.pop('extra', {})
-        
-        # Add component info to extra
-        extra['component'] = self.name
+        extra = kwargs.pop('extra', None)
         
         # Format message with remaining kwargs as structured data
         formatted_msg = self._format_message(msg, **kwargs)
@@ -197,15 +383,18 @@ class StructuredLogger:
     
     def debug(self, msg: str, *args, **kwargs):
         """Log debug message."""
-        self._log(logging.DEBUG, msg, *args, **kwargs)
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._log(logging.DEBUG, msg, *args, **kwargs)
     
     def info(self, msg: str, *args, **kwargs):
         """Log info message."""
-        self._log(logging.INFO, msg, *args, **kwargs)
+        if self._logger.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, msg, *args, **kwargs)
     
     def warning(self, msg: str, *args, **kwargs):
         """Log warning message."""
-        self._log(logging.WARNING, msg, *args, **kwargs)
+        if self._logger.isEnabledFor(logging.WARNING):
+            self._log(logging.WARNING, msg, *args, **kwargs)
     
     def warn(self, msg: str, *args, **kwargs):
         """Log warning message (alias)."""
@@ -213,7 +402,8 @@ class StructuredLogger:
     
     def error(self, msg: str, *args, **kwargs):
         """Log error message."""
-        self._log(logging.ERROR, msg, *args, **kwargs)
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._log(logging.ERROR, msg, *args, **kwargs)
     
     def exception(self, msg: str, *args, **kwargs):
         """Log exception message."""
@@ -222,39 +412,51 @@ class StructuredLogger:
     
     def critical(self, msg: str, *args, **kwargs):
         """Log critical message."""
-        self._log(logging.CRITICAL, msg, *args, **kwargs)
+        if self._logger.isEnabledFor(logging.CRITICAL):
+            self._log(logging.CRITICAL, msg, *args, **kwargs)
+
 
+class _SingletonMeta(type):
+    """Metaclass that constructs and initializes a class's instance only once."""
+    
+    def __call__(cls, *args, **kwargs):
+        instance = cls._instance
+        if instance is not None:
+            return instance
+        
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__call__(*args, **kwargs)
+            return cls._instance
 
-class CentralizedLogManager:
+
+class CentralizedLogManager(metaclass=_SingletonMeta):
     """Singleton centralized log manager with rotating handlers and compression."""
     
     _instance = None
     _lock = threading.Lock()
-    _initialized = False
-    
-    def __new__(cls):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super().__new__(cls)
-        return cls._instance
     
     def __init__(self):
-        if self._initialized:
-            return
-        
+        # Only ever runs once per instance; see _SingletonMeta
         self._loggers: Dict[str, StructuredLogger] = {}
         self._handlers: Dict[str, logging.Handler] = {}
+        self._listeners: List[logging.handlers.QueueListener] = []
+        self._attached_handlers: List[Tuple[logging.Logger, logging.Handler]] = []
         self._log_directory = None
         self._setup_complete = False
         
-        with self._lock:
-            if not self._initialized:
-                self._ensure_log_directory()
-                self._setup_root_logger()
-                self._setup_component_loggers()
-                self._initialized = True
-                self._setup_complete = True
+        # None of the configured formats use the thread, process or task
+        # fields, so skip looking them up for every record
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+        logging.logAsyncioTasks = False
+        
+        self._ensure_log_directory()
+        self._setup_root_logger()
+        self._setup_component_loggers()
+        self._setup_structlog()
+        self._setup_complete = True
     
     def _ensure_log_directory(self):
         """Ensure the log directory exists."""
@@ -268,7 +470,7 @@ class CentralizedLogManager:
                 fmt = "%(asctime)s %(name)s %(levelname)s %(component)s %(message)s"
             else:
                 fmt = "%(asctime)s %(name)s %(levelname)s %(message)s"
-            return jsonlogger.JsonFormatter(
+            return PrebuiltJsonFormatter(
                 fmt=fmt,
                 datefmt="%Y-%m-%dT%H:%M:%S"
             )
@@ -280,12 +482,12 @@ class CentralizedLogManager:
                 fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
             else:
                 fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-            return logging.Formatter(
+            return CachedTimeFormatter(
                 fmt=fmt,
                 datefmt="%Y-%m-%d %H:%M:%S"
             )
     
-    def _create_rotating_handler(self, log_file: str, level: int = logging.INFO, use_component_filter: bool = True) -> logging.Handler:
+    def _create_rotating_handler(self, log_file: str, level: int = logging.INFO, include_component: bool = True) -> logging.Handler:
         """Create a rotating file handler with proper configuration."""
         file_path = self._log_directory / log_file
         max_bytes = settings.log_file_max_size_mb * 1024 * 1024
@@ -312,9 +514,8 @@ class CentralizedLogManager:
         
         handler.setLevel(level)
         
-        # Add component filter for file handlers
-        if use_component_filter:
-            handler.addFilter(ComponentFilter())
+        # The formatter resolves the component of each record
+        if include_component:
             handler.setFormatter(self._create_formatter(include_component=True, require_component=True))
         else:
             handler.setFormatter(self._create_formatter(include_component=False))
@@ -323,13 +524,35 @@ class CentralizedLogManager:
         
         return handler
     
+    def _create_queue_handler(self, *handlers: logging.Handler) -> logging.Handler:
+        """
+        Put file handlers behind a queue served by a background listener thread.
+        
+        The logging call only enqueues the record; formatting, disk writes and
+        rollover happen on the listener thread, off the request path. As the
+        listener is the only writer, file handlers are flushed once per batch
+        of queued records rather than after each one.
+        """
+        for handler in handlers:
+            if isinstance(handler, _BatchedFlushMixin):
+                handler.batch_flush = True
+        
+        log_queue = queue.SimpleQueue()
+        listener = _BatchingQueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        self._listeners.append(listener)
+        
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        # Don't enqueue records that none of the handlers would emit
+        queue_handler.setLevel(min(handler.level for handler in handlers))
+        return queue_handler
+    
     def _create_console_handler(self) -> logging.Handler:
         """Create console handler."""
         handler = logging.StreamHandler(sys.stdout)
         handler.setLevel(getattr(logging, settings.log_level.upper(), logging.INFO))
         
-        # Console handler gets component filter and simpler format
-        handler.addFilter(ComponentFilter())
+        # Console handler gets a simpler format
         handler.setFormatter(self._create_formatter(include_component=False))
         handler.addFilter(SecurityFilter())
         return handler
@@ -348,13 +571,13 @@ class CentralizedLogManager:
         # Add main app log file handler if file logging is enabled
         if settings.enable_file_logging:
             app_handler = self._create_rotating_handler(settings.app_log_file)
-            root_logger.addHandler(app_handler)
             self._handlers['app'] = app_handler
             
             # Add error log handler (only for ERROR and CRITICAL)
             error_handler = self._create_rotating_handler(settings.error_log_file, logging.ERROR)
-            root_logger.addHandler(error_handler)
             self._handlers['error'] = error_handler
+            
+            root_logger.addHandler(self._create_queue_handler(app_handler, error_handler))
     
     def _setup_component_loggers(self):
         """Setup loggers for different components."""
@@ -387,8 +610,9 @@ class CentralizedLogManager:
         
         for component, config in component_configs.items():
             # Create handler for this component
-            handler = self._create_rotating_handler(config['file'], config['level'])
-            self._handlers[component] = handler
+            file_handler = self._create_rotating_handler(config['file'], config['level'])
+            self._handlers[component] = file_handler
+            handler = self._create_queue_handler(file_handler)
             
             # Configure loggers for this component
             for logger_name in config['loggers']:
@@ -399,16 +623,43 @@ class CentralizedLogManager:
                     logger.handlers.clear()
                 
                 logger.addHandler(handler)
+                self._attached_handlers.append((logger, handler))
                 logger.setLevel(config['level'])
                 
                 # Prevent propagation to root logger for component-specific loggers to avoid duplicates
                 if logger_name in ['security', 'auth', 'ai_manager', 'ai', 'gemini', 'openai']:
                     logger.propagate = False
     
+    def _setup_structlog(self):
+        """Configure structlog, used by the exception handlers and health checks."""
+        if settings.log_format == "json":
+            timestamper = structlog.processors.TimeStamper(fmt="iso")
+            renderer = structlog.processors.JSONRenderer(serializer=_orjson_dumps)
+        else:
+            timestamper = structlog.processors.TimeStamper(fmt="%Y-%m-%d %H:%M:%S", utc=False)
+            renderer = structlog.dev.ConsoleRenderer(colors=sys.stdout.isatty())
+        
+        structlog.configure(
+            processors=[
+                structlog.contextvars.merge_contextvars,
+                structlog.processors.add_log_level,
+                structlog.processors.StackInfoRenderer(),
+                structlog.dev.set_exc_info,
+                timestamper,
+                renderer,
+            ],
+            wrapper_class=structlog.make_filtering_bound_logger(
+                getattr(logging, settings.log_level.upper(), logging.INFO)
+            ),
+            logger_factory=structlog.PrintLoggerFactory(),
+            cache_logger_on_first_use=True,
+        )
+    
     def get_logger(self, name: str) -> StructuredLogger:
         """Get a structured logger instance for a component."""
-        if name in self._loggers:
-            return self._loggers[name]
+        structured_logger = self._loggers.get(name)
+        if structured_logger is not None:
+            return structured_logger
         
         # Create a new structured logger
         standard_logger = logging.getLogger(name)
@@ -424,7 +675,22 @@ class CentralizedLogManager:
     def shutdown(self):
         """Shutdown all handlers gracefully."""
         try:
-            # Close all custom handlers first
+            # Stop the queue listeners first so queued records are written out
+            for listener in self._listeners:
+                try:
+                    listener.stop()
+                except Exception as e:
+                    print(f"Error stopping log listener: {e}")
+            self._listeners.clear()
+            
+            # Detach the queue handlers given to component loggers, including
+            # third-party ones (uvicorn, httpx) whose own handlers are kept, so
+            # that setting up again does not stack a second one on each
+            for logger, handler in self._attached_handlers:
+                logger.removeHandler(handler)
+            self._attached_handlers.clear()
+            
+            # Close all custom handlers
             for handler_name, handler in self._handlers.items():
                 try:
                     if hasattr(handler, 'close'):
@@ -435,6 +701,9 @@ class CentralizedLogManager:
             # Clear handlers dict
             self._handlers.clear()
             
+            # Let pending rollover compression finish before returning
+            _wait_for_compression()
+            
             # Close all logger handlers
             for logger_name, structured_logger in self._loggers.items():
                 try:
@@ -466,8 +735,8 @@ class CentralizedLogManager:
         except Exception as e:
             print(f"Error during logging shutdown: {e}")
         
-        # Reset initialization flag
-        self._initialized = False
+        # Drop the singleton so the next CentralizedLogManager() sets up afresh
+        type(self)._instance = None
 
 
 # Global singleton instance
@@ -484,18 +753,17 @@ def setup_logging():
 
 def get_logger(name: str) -> StructuredLogger:
     """Get a structured logger instance."""
-    global _log_manager
-    if _log_manager is None:
-        _log_manager = CentralizedLogManager()
-    return _log_manager.get_logger(name)
+    manager = _log_manager
+    if manager is None:
+        manager = setup_logging()
+    return manager.get_logger(name)
 
 
 def get_standard_logger(name: str) -> logging.Logger:
     """Get a standard Python logger instance."""
-    global _log_manager
     if _log_manager is None:
-        _log_manager = CentralizedLogManager()
-    return _log_manager.get_standard_logger(name)
+        setup_logging()
+    return logging.getLogger(name)
 
 
 def shutdown_logging():
@@ -547,5 +815,4 @@ def _cleanup_logging():
         print(f"Error during logging cleanup: {e}")
 
 
-import atexit
 atexit.register(_cleanup_logging) 
\ No newline at end of file
@@ -1,30 +1,62 @@
 """
 Security middleware for enhanced application security.
+
+All middleware here is implemented as plain ASGI callables rather than on top of
+Starlette's ``BaseHTTPMiddleware``, which wraps every request in extra
+Request/Response objects and an anyio task group.
 """
-import time
-import uuid
-from typing import Callable
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+import asyncio
+import logging
+import secrets
+from time import perf_counter
+from typing import Optional
+from fastapi import status
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from core.exceptions import error_response
 from core.logging import get_logger, access_logger
 
 # Use centralized logging system
 logger = get_logger("middleware")
 
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+def _client_host(scope: Scope, headers: Optional[Headers] = None) -> str:
+    """
+    Resolve the client address, honouring X-Forwarded-For when behind a proxy.
+
+    The result is kept in the request state (request.state.client_ip) so that
+    every middleware needing it shares a single lookup.
+    """
+    state = scope.setdefault("state", {})
+    client_host = state.get("client_ip")
+    if client_host is None:
+        if headers is None:
+            headers = Headers(scope=scope)
+        forwarded_for = headers.get("x-forwarded-for")
+        if forwarded_for:
+            client_host = forwarded_for.partition(",")[0].strip()
+        else:
+            client = scope.get("client")
+            client_host = client[0] if client else "unknown"
+        state["client_ip"] = client_host
+    return client_host
+
+
+class SecurityHeadersMiddleware:
     """Middleware to add security headers to all responses."""
-    
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        response = await call_next(request)
-        
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
         # Security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        
+        self.headers = [
+            (b"x-content-type-options", b"nosniff"),
+            (b"x-frame-options", b"DENY"),
+            (b"x-xss-protection", b"1; mode=block"),
+            (b"referrer-policy", b"strict-origin-when-cross-origin"),
+            (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+        ]
+
         # Content Security Policy (adjust based on your needs)
         csp = (
             "default-src 'self'; "
@@ -35,205 +67,295 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
             "connect-src 'self'; "
             "frame-ancestors 'none';"
         )
-        response.headers["Content-Security-Policy"] = csp
-        
+        self.headers.append((b"content-security-policy", csp.encode("latin-1")))
+
         # HSTS (only add in production with HTTPS)
-        # response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        
-        logger.debug("Security headers added", path=str(request.url.path))
-        return response
+        # self.headers.append((b"strict-transport-security", b"max-age=31536000; includeSubDomains"))
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"],
+                    *self.headers,
+                ]
+                logger.debug("Security headers added", path=scope["path"])
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+class RequestLoggingMiddleware:
     """Middleware to log all incoming requests and responses."""
-    
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        # Generate request ID
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
-        
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Bound once; every request logs through these
+        self._log_info = access_logger.info
+        self._log_error = access_logger.error
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Generate request ID and expose it as request.state.request_id. 128
+        # random bits in URL-safe base64: cheaper than building a UUID, and at
+        # 22 characters too short for SecurityFilter to redact as an API key.
+        request_id = secrets.token_urlsafe(16)
+        scope.setdefault("state", {})["request_id"] = request_id
+
         # Log request
-        start_time = time.time()
-        
-        # Get client info
-        client_host = request.client.host if request.client else "unknown"
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            client_host = forwarded_for.split(",")[0].strip()
-        
-        # Use access logger for HTTP access logs
-        access_logger.info(
-            "Request started",
-            request_id=request_id,
-            method=request.method,
-            path=str(request.url.path),
-            query_params=str(request.query_params),
-            client_host=client_host,
-            user_agent=request.headers.get("User-Agent", "unknown")
-        )
-        
-        # Process request
-        try:
-            response = await call_next(request)
-            
-            # Calculate processing time
-            process_time = time.time() - start_time
-            
-            # Log response
-            access_logger.info(
-                "Request completed",
+        start_time = perf_counter()
+        log_info = self._log_info
+        method = scope["method"]
+        path = scope["path"]
+
+        # Only gather the access log fields when INFO records are emitted
+        log_access = access_logger.isEnabledFor(logging.INFO)
+        client_host = None
+        if log_access:
+            # Get client info
+            headers = Headers(scope=scope)
+            client_host = _client_host(scope, headers)
+
+            # Use access logger for HTTP access logs
+            log_info(
+                "Request started",
                 request_id=request_id,
-                method=request.method,
-                path=str(request.url.path),
-                status_code=response.status_code,
-                process_time_ms=round(process_time * 1000, 2),
-                client_host=client_host
+                method=method,
+                path=path,
+                query_params=scope.get("query_string", b"").decode("latin-1"),
+                client_host=client_host,
+                user_agent=headers.get("user-agent", "unknown")
             )
-            
-            # Add request ID to response headers
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Process-Time"] = str(round(process_time * 1000, 2))
-            
-            return response
-            
+
+        async def send_with_logging(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Calculate processing time
+                process_time_ms = (perf_counter() - start_time) * 1000
+
+                # Log response
+                if log_access:
+                    log_info(
+                        "Request completed",
+                        request_id=request_id,
+                        method=method,
+                        path=path,
+                        status_code=message["status"],
+                        process_time_ms=round(process_time_ms, 2),
+                        client_host=client_host
+                    )
+
+                # Add request ID to response headers
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-request-id", request_id.encode("latin-1")),
+                    (b"x-process-time", f"{process_time_ms:.2f}".encode("latin-1")),
+                ]
+            await send(message)
+
+        # Process request
+        try:
+            await self.app(scope, receive, send_with_logging)
         except Exception as e:
-            process_time = time.time() - start_time
-            access_logger.error(
+            process_time = perf_counter() - start_time
+            self._log_error(
                 "Request failed",
                 request_id=request_id,
-                method=request.method,
-                path=str(request.url.path),
+                method=method,
+                path=path,
                 exception=str(e),
                 process_time_ms=round(process_time * 1000, 2),
-                client_host=client_host,
+                client_host=client_host or _client_host(scope),
                 exc_info=True
             )
             raise
 
 
-class RequestSizeMiddleware(BaseHTTPMiddleware):
+class RequestSizeMiddleware:
     """Middleware to limit request body size."""
-    
-    def __init__(self, app, max_size: int = 50 * 1024 * 1024):  # 50MB default
-        super().__init__(app)
+
+    def __init__(self, app: ASGIApp, max_size: int = 50 * 1024 * 1024):  # 50MB default
+        self.app = app
         self.max_size = max_size
-    
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        # Check Content-Length header
-        content_length = request.headers.get("Content-Length")
+        # The rejection never varies, so build it once and resend it
+        self.too_large_response = error_response(
+            "HTTPException",
+            f"Request body too large. Maximum size: {max_size} bytes",
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Check Content-Length header before the body is read
+        headers = Headers(scope=scope)
+        content_length = headers.get("content-length")
         if content_length:
-            content_length = int(content_length)
-            if content_length > self.max_size:
-                logger.warning(
-                    "Request body too large",
-                    content_length=content_length,
-                    max_size=self.max_size,
-                    client_host=request.client.host if request.client else "unknown",
-                    path=str(request.url.path)
-                )
-                from fastapi import HTTPException, status
-                raise HTTPException(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    detail=f"Request body too large. Maximum size: {self.max_size} bytes"
-                )
-        
-        return await call_next(request)
-
-
-class IPWhitelistMiddleware(BaseHTTPMiddleware):
+            try:
+                content_length = int(content_length)
+            except ValueError:
+                # Leave malformed values for the server to reject
+                content_length = 0
+
+            max_size = self.max_size
+            if content_length > max_size:
+                if logger.isEnabledFor(logging.WARNING):
+                    logger.warning(
+                        "Request body too large",
+                        content_length=content_length,
+                        max_size=max_size,
+                        client_host=_client_host(scope, headers),
+                        path=scope["path"]
+                    )
+                await self.too_large_response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
+
+
+class IPWhitelistMiddleware:
     """Middleware to restrict access based on IP whitelist (optional)."""
-    
-    def __init__(self, app, whitelist: list = None, enabled: bool = False):
-        super().__init__(app)
-        self.whitelist = whitelist or []
+
+    def __init__(self, app: ASGIApp, whitelist: list = None, enabled: bool = False):
+        self.app = app
+        self.whitelist = frozenset(whitelist or ())
         self.enabled = enabled
-    
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        if not self.enabled or not self.whitelist:
-            return await call_next(request)
-        
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled or not self.whitelist:
+            await self.app(scope, receive, send)
+            return
+
         # Get client IP
-        client_ip = request.client.host if request.client else "unknown"
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            client_ip = forwarded_for.split(",")[0].strip()
-        
+        client_ip = _client_host(scope)
+
         # Check whitelist
         if client_ip not in self.whitelist:
             logger.warning(
                 "IP not in whitelist - access denied",
                 client_ip=client_ip,
-                path=str(request.url.path),
-                method=request.method
-            )
-            from fastapi import HTTPException, status
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Access denied"
+                path=scope["path"],
+                method=scope["method"]
             )
-        
+            response = error_response("HTTPException", "Access denied", status.HTTP_403_FORBIDDEN)
+            await response(scope, receive, send)
+            return
+
         logger.debug("IP whitelist check passed", client_ip=client_ip)
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 
-class RequestTimeoutMiddleware(BaseHTTPMiddleware):
+class RequestTimeoutMiddleware:
     """Middleware to enforce request timeout."""
-    
-    def __init__(self, app, timeout_seconds: int = 300):  # 5 minutes default
-        super().__init__(app)
+
+    def __init__(self, app: ASGIApp, timeout_seconds: int = 300):  # 5 minutes default
+        self.app = app
         self.timeout_seconds = timeout_seconds
-    
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        import asyncio
-        
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_tracking_start(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        # Run the request in the current task under a deadline, rather than
+        # wrapping it in a new task as asyncio.wait_for does
+        deadline = asyncio.timeout(self.timeout_seconds)
         try:
-            # Execute with timeout
-            response = await asyncio.wait_for(
-                call_next(request),
-                timeout=self.timeout_seconds
-            )
-            return response
-            
-        except asyncio.TimeoutError:
+            async with deadline:
+                await self.app(scope, receive, send_tracking_start)
+
+        except TimeoutError:
+            if not deadline.expired():
+                # Raised by the application itself, not by our deadline
+                raise
+            client = scope.get("client")
             logger.error(
                 "Request timeout",
                 timeout_seconds=self.timeout_seconds,
-                path=str(request.url.path),
-                method=request.method,
-                client_host=request.client.host if request.client else "unknown"
+                path=scope["path"],
+                method=scope["method"],
+                client_host=client[0] if client else "unknown"
             )
-            from fastapi import HTTPException, status
-            raise HTTPException(
-                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                detail=f"Request timeout after {self.timeout_seconds} seconds"
+            if response_started:
+                # Headers already went out; nothing sensible left to send
+                raise
+            response = error_response(
+                "HTTPException",
+                f"Request timeout after {self.timeout_seconds} seconds",
+                status.HTTP_504_GATEWAY_TIMEOUT
             )
+            await response(scope, receive, send)
+
+
+class HealthCheckMiddleware:
+    """
+    Middleware to answer health checks before the rest of the middleware stack.
+
+    Load balancer probes hit the health endpoint constantly; a GET on ``path``
+    is answered directly with a prebuilt JSON body, skipping logging, security
+    headers and routing.
+    """
+
+    def __init__(self, app: ASGIApp, path: str = "/health", body: bytes = b'{"status":"ok"}'):
+        self.app = app
+        self.path = path
+        self.body = body
+        self.headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+        ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"] == self.path and scope["method"] == "GET":
+            await send({"type": "http.response.start", "status": 200, "headers": self.headers})
+            await send({"type": "http.response.body", "body": self.body})
+            return
+
+        await self.app(scope, receive, send)
 
 
 def setup_middleware(app, config: dict = None):
     """Setup all security middleware for the application."""
     config = config or {}
-    
+
     # Add middleware in reverse order (last added is executed first)
-    
+
     # Request timeout
     if config.get("enable_timeout", True):
         timeout = config.get("timeout_seconds", 300)
         app.add_middleware(RequestTimeoutMiddleware, timeout_seconds=timeout)
-    
+
     # Request size limiting
     if config.get("enable_size_limit", True):
         max_size = config.get("max_request_size", 50 * 1024 * 1024)
         app.add_middleware(RequestSizeMiddleware, max_size=max_size)
-    
+
     # IP whitelist (usually disabled, enable for high-security environments)
     if config.get("enable_ip_whitelist", False):
         whitelist = config.get("ip_whitelist", [])
         app.add_middleware(IPWhitelistMiddleware, whitelist=whitelist, enabled=True)
-    
+
     # Request logging
     if config.get("enable_request_logging", True):
         app.add_middleware(RequestLoggingMiddleware)
-    
+
     # Security headers (should be first to add headers to all responses)
     if config.get("enable_security_headers", True):
-        app.add_middleware(SecurityHeadersMiddleware) 
\ No newline at end of file
+        app.add_middleware(SecurityHeadersMiddleware)
\ No newline at end of file
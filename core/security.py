@@ -2,29 +2,163 @@
 Security utilities for password hashing and JWT token handling.
 """
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Union
-from passlib.context import CryptContext
-from jose import JWTError, jwt
+from typing import Dict, Optional, Set, Tuple, Union
+import jwt
+from jwt import InvalidTokenError as JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_
+from sqlalchemy import bindparam, event, inspect as sa_inspect, select, or_
+from sqlalchemy.orm import make_transient_to_detached
 from core.config import settings
 from core.logging import get_logger, security_logger
 from db_config import get_async_db
 from models.models import User, UserRoleEnum, UserSession
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import asyncio
 import base64
+import bcrypt
+import hashlib
+import logging
+import os
+import threading
+import time
 
 # Initialize logger
 logger = security_logger
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt only uses the first 72 bytes of a password; longer ones are
+# truncated, as passlib did for the existing hashes
+BCRYPT_MAX_PASSWORD_BYTES = 72
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
+# bcrypt is CPU bound, so async code hashes on this pool instead of the event
+# loop. One worker per core (unless configured) caps how much CPU a burst of
+# logins can take.
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.bcrypt_workers or os.cpu_count() or 1,
+    thread_name_prefix="bcrypt",
+)
+
+# Successful password verifications are remembered briefly so that repeated
+# logins with the same credentials skip the bcrypt work. Entries are keyed by
+# a keyed BLAKE2b digest, so neither the password nor its hash is kept here.
+# Failed verifications are never cached.
+PASSWORD_CACHE_SIZE = 4096
+PASSWORD_CACHE_TTL = settings.password_cache_ttl_seconds
+_password_cache: "OrderedDict[bytes, float]" = OrderedDict()
+_password_cache_lock = threading.Lock()
+
+
+def _password_cache_key(plain_password: str, hashed_password: str) -> bytes:
+    """Derive the cache key for a password/hash pair."""
+    return hashlib.blake2b(
+        plain_password.encode() + b"|" + hashed_password.encode(),
+        key=settings.jwt_secret_key.encode()[:64],
+        digest_size=16,
+    ).digest()
+
+
+def _password_cache_hit(cache_key: bytes) -> bool:
+    """Check for an unexpired successful verification."""
+    with _password_cache_lock:
+        expires_at = _password_cache.get(cache_key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del _password_cache[cache_key]
+            return False
+        _password_cache.move_to_end(cache_key)
+        return True
+
+
+def _password_cache_store(cache_key: bytes):
+    """Remember a successful verification, evicting the least recently used."""
+    with _password_cache_lock:
+        _password_cache[cache_key] = time.monotonic() + PASSWORD_CACHE_TTL
+        _password_cache.move_to_end(cache_key)
+        if len(_password_cache) > PASSWORD_CACHE_SIZE:
+            _password_cache.popitem(last=False)
+
+
+# Recently authenticated tokens, so that a client's follow-up requests skip
+# the JWT decode and every user/session query. Entries map a BLAKE2b digest of
+# the token to (user_id, valid_until, column values of the user) and are
+# dropped by forget_user_tokens whenever the user's session or row changes.
+# Other worker processes may keep accepting an invalidated token, or serve
+# the old user row, until their entry's TTL runs out, so the cache is off
+# unless settings.auth_cache_ttl_seconds enables it.
+TOKEN_CACHE_SIZE = 10_000
+TOKEN_CACHE_TTL = settings.auth_cache_ttl_seconds
+_token_cache: "OrderedDict[bytes, Tuple[int, float, dict]]" = OrderedDict()
+# The cache keys held for each user, so that forgetting a user's tokens only
+# touches that user's entries
+_user_token_keys: Dict[int, Set[bytes]] = {}
+_USER_COLUMN_KEYS = tuple(attr.key for attr in sa_inspect(User).column_attrs)
+
+
+# Decoded payloads of recently verified access tokens, so that a client's
+# follow-up requests skip the signature check and JSON parsing. Entries map a
+# BLAKE2b digest of the token to (payload, valid_until) and never outlive the
+# token's exp claim. One-off tokens (password reset, activation) go through
+# verify_token uncached.
+PAYLOAD_CACHE_SIZE = 10_000
+PAYLOAD_CACHE_TTL = 60  # seconds
+_payload_cache: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+_payload_cache_lock = threading.Lock()
+
+
+def _token_cache_key(token: str) -> bytes:
+    """Derive the cache key for a bearer token."""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def _cache_token(cache_key: bytes, user_id: int, valid_until: float, columns: dict):
+    """Cache an authentication, evicting the least recently used past the limit."""
+    _uncache_token(cache_key)
+    _token_cache[cache_key] = (user_id, valid_until, columns)
+    _user_token_keys.setdefault(user_id, set()).add(cache_key)
+    if len(_token_cache) > TOKEN_CACHE_SIZE:
+        _uncache_token(next(iter(_token_cache)))
+
+
+def _uncache_token(cache_key: bytes):
+    """Drop one cached authentication, if present."""
+    cached = _token_cache.pop(cache_key, None)
+    if cached is None:
+        return
+    user_keys = _user_token_keys.get(cached[0])
+    if user_keys is not None:
+        user_keys.discard(cache_key)
+        if not user_keys:
+            del _user_token_keys[cached[0]]
+
+
+def forget_user_tokens(user_id: int):
+    """
+    Drop the cached authentications of a user.
+    
+    Call this after the user's session is replaced or deleted.
+    
+    Args:
+        user_id: The user whose tokens should be authenticated afresh
+    """
+    for key in _user_token_keys.pop(user_id, ()):
+        _token_cache.pop(key, None)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _forget_changed_user(mapper, connection, target):
+    """Stop serving cached copies of a user row once it is changed."""
+    forget_user_tokens(target.id)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -38,7 +172,16 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         bool: True if password matches, False otherwise
     """
     try:
-        result = pwd_context.verify(plain_password, hashed_password)
+        cache_key = _password_cache_key(plain_password, hashed_password)
+        if _password_cache_hit(cache_key):
+            logger.debug("Password verification completed", success=True, cached=True)
+            return True
+        
+        result = bcrypt.checkpw(
+            plain_password.encode()[:BCRYPT_MAX_PASSWORD_BYTES], hashed_password.encode()
+        )
+        if result and PASSWORD_CACHE_TTL > 0:
+            _password_cache_store(cache_key)
         logger.debug("Password verification completed", success=result)
         return result
     except Exception as e:
@@ -57,7 +200,10 @@ def get_password_hash(password: str) -> str:
         str: The hashed password
     """
     try:
-        hashed = pwd_context.hash(password)
+        hashed = bcrypt.hashpw(
+            password.encode()[:BCRYPT_MAX_PASSWORD_BYTES],
+            bcrypt.gensalt(rounds=settings.bcrypt_rounds),
+        ).decode()
         logger.debug("Password hash generated successfully")
         return hashed
     except Exception as e:
@@ -65,6 +211,37 @@ def get_password_hash(password: str) -> str:
         raise
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a plain password against its hash without blocking the event loop.
+    
+    Args:
+        plain_password: The plain text password
+        hashed_password: The hashed password to verify against
+        
+    Returns:
+        bool: True if password matches, False otherwise
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, verify_password, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hash a plain password without blocking the event loop.
+    
+    Args:
+        password: The plain text password to hash
+        
+    Returns:
+        str: The hashed password
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Create a JWT access token.
@@ -77,18 +254,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         str: The encoded JWT token
     """
     try:
+        # JWT times are whole seconds since the epoch (RFC 7519)
         to_encode = data.copy()
         if expires_delta:
-            expire = datetime.now(timezone.utc) + expires_delta
+            expire = int(time.time() + expires_delta.total_seconds())
         else:
-            expire = datetime.now(timezone.utc) + timedelta(minutes=settings.jwt_access_token_expire_minutes)
+            expire = int(time.time()) + settings.jwt_access_token_expire_minutes * 60
         
-        to_encode.update({"exp": expire})
+        to_encode["exp"] = expire
         encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
         
-        logger.info("Access token created", 
-                   username=data.get("sub"), 
-                   expires_at=expire.isoformat())
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Access token created", 
+                       username=data.get("sub"), 
+                       expires_at=datetime.fromtimestamp(expire, timezone.utc).isoformat())
         return encoded_jwt
     except Exception as e:
         logger.error("Token creation error", error=str(e), username=data.get("sub"))
@@ -107,19 +286,23 @@ def create_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
         str: The encoded JWT token
     """
     try:
+        # JWT times are whole seconds since the epoch (RFC 7519)
         to_encode = data.copy()
+        now = time.time()
         if expires_delta:
-            expire = datetime.now(timezone.utc) + expires_delta
+            expire = int(now + expires_delta.total_seconds())
         else:
-            expire = datetime.now(timezone.utc) + timedelta(hours=24)  # Default 24 hours
+            expire = int(now) + 24 * 60 * 60  # Default 24 hours
         
-        to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc)})
+        to_encode["exp"] = expire
+        to_encode["iat"] = int(now)
         encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
         
-        logger.info("Token created", 
-                   username=data.get("sub"),
-                   type=data.get("type", "unknown"),
-                   expires_at=expire.isoformat())
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Token created", 
+                       username=data.get("sub"),
+                       type=data.get("type", "unknown"),
+                       expires_at=datetime.fromtimestamp(expire, timezone.utc).isoformat())
         return encoded_jwt
     except Exception as e:
         logger.error("Token creation error", 
@@ -129,18 +312,24 @@ def create_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
         raise
 
 
-def verify_token(token: str) -> Optional[dict]:
+def verify_token(token: str, required: Tuple[str, ...] = ("exp", "sub")) -> Optional[dict]:
     """
     Verify and decode a JWT token.
     
     Args:
         token: The JWT token to verify
+        required: Claims the token must carry
         
     Returns:
         dict: The decoded token payload if valid, None otherwise
     """
     try:
-        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+        payload = jwt.decode(
+            token,
+            settings.jwt_secret_key,
+            algorithms=[settings.jwt_algorithm],
+            options={"require": list(required)},
+        )
         logger.debug("Token verified successfully", username=payload.get("sub"))
         return payload
     except JWTError as e:
@@ -151,6 +340,45 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
+def _verify_access_token(token: str, cache_key: bytes) -> Optional[dict]:
+    """Verify a bearer token naming a user, reusing a recent decode of it."""
+    now = time.time()
+    with _payload_cache_lock:
+        cached = _payload_cache.get(cache_key)
+        if cached is not None:
+            if cached[1] > now:
+                _payload_cache.move_to_end(cache_key)
+                return cached[0]
+            del _payload_cache[cache_key]
+    
+    payload = verify_token(token, required=("exp", "sub"))
+    if payload is None:
+        return None
+    
+    valid_until = min(now + PAYLOAD_CACHE_TTL, payload["exp"])
+    if valid_until > now:
+        with _payload_cache_lock:
+            _payload_cache[cache_key] = (payload, valid_until)
+            if len(_payload_cache) > PAYLOAD_CACHE_SIZE:
+                _payload_cache.popitem(last=False)
+    return payload
+
+
+# The user with a valid session for a token, built once rather than per request
+_USER_SESSION_STMT = (
+    select(User, UserSession.expires_at)
+    .join(UserSession, UserSession.user_id == User.id)
+    .where(
+        User.username == bindparam("username"),
+        UserSession.session_token == bindparam("token"),
+        or_(
+            UserSession.expires_at > bindparam("now"),
+            UserSession.expires_at.is_(None)
+        )  # Check if not expired
+    )
+)
+
+
 async def get_current_user(token: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_async_db)) -> User:
     """
     Get the current user from the JWT token.
@@ -172,49 +400,60 @@ async def get_current_user(token: HTTPAuthorizationCredentials = Depends(securit
     )
     
     try:
-        # Verify the token
-        payload = jwt.decode(token.credentials, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
-        username = payload.get("sub")
-        if username is None:
-            logger.warning("Token missing username claim")
-            raise credentials_exception
+        # Reuse a recent authentication of this token. The user is rebuilt
+        # from the cached row and attached to this session without a query.
+        cache_key = _token_cache_key(token.credentials)
+        cached = _token_cache.get(cache_key) if TOKEN_CACHE_TTL > 0 else None
+        if cached is not None:
+            _, valid_until, columns = cached
+            if valid_until > time.time():
+                _token_cache.move_to_end(cache_key)
+                user = User(**columns)
+                make_transient_to_detached(user)
+                return await db.merge(user, load=False)
+            _uncache_token(cache_key)
         
-        # Find the user
-        user_stmt = select(User).where(User.username == username)
-        user_result = await db.execute(user_stmt)
-        user = user_result.scalar_one_or_none()
-        if user is None:
-            logger.warning("User not found for token", username=username)
+        # Verify the token; it must name the user and expire
+        payload = _verify_access_token(token.credentials, cache_key)
+        if payload is None:
             raise credentials_exception
+        username = payload["sub"]
         
-        # Get the token from the Authorization header
-        token_value = token.credentials
-
-        # Check if session is still valid
-        session_stmt = select(UserSession).where(
-            UserSession.user_id == user.id,
-            UserSession.session_token == token_value,  # Check the specific token
-            or_(
-                UserSession.expires_at > datetime.now(timezone.utc),
-                UserSession.expires_at.is_(None)
-            )  # Check if not expired
+        # Find the user together with a valid session for this specific
+        # token, in a single round trip
+        user_result = await db.execute(
+            _USER_SESSION_STMT,
+            {
+                "username": username,
+                "token": token.credentials,
+                "now": datetime.now(timezone.utc),
+            },
         )
-        session_result = await db.execute(session_stmt)
-        session = session_result.scalar_one_or_none()
+        row = user_result.first()
 
-        if not session:
-            logger.warning("No valid session found", username=username, user_id=user.id)
+        if row is None:
+            logger.warning("No valid session found for token", username=username)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Session expired or invalidated. Please log in again.",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        user, session_expires_at = row
+        
+        # Cache the authentication, never past the token or session expiry
+        if TOKEN_CACHE_TTL <= 0:
+            return user
+        now = time.time()
+        valid_until = min(now + TOKEN_CACHE_TTL, payload.get("exp", now))
+        if session_expires_at is not None:
+            valid_until = min(valid_until, session_expires_at.timestamp())
+        loaded = sa_inspect(user).dict
+        if all(key in loaded for key in _USER_COLUMN_KEYS):
+            columns = {key: loaded[key] for key in _USER_COLUMN_KEYS}
+            _cache_token(cache_key, user.id, valid_until, columns)
         
         return user
         
-    except JWTError as e:
-        logger.warning("JWT verification failed", error=str(e))
-        raise credentials_exception
     except Exception as e:
         logger.error("Authentication error", error=str(e))
         raise credentials_exception
@@ -264,6 +503,21 @@ async def get_current_admin_user(current_user: User = Depends(get_current_active
 
 
 # API Key Encryption/Decryption Functions
+
+# API keys are encrypted with AES-256-GCM and stored as this prefix followed by
+# the URL-safe base64 of nonce + ciphertext. Keys stored earlier as Fernet
+# tokens are still decrypted.
+API_KEY_PREFIX = "v2:"
+_API_KEY_NONCE_BYTES = 12
+
+
+@lru_cache(maxsize=1)
+def _get_aead() -> AESGCM:
+    """Get the AES-GCM cipher for API key encryption, built once."""
+    return AESGCM(hashlib.sha256(settings.jwt_secret_key.encode()).digest())
+
+
+@lru_cache(maxsize=1)
 def _get_encryption_key() -> bytes:
     """Get or generate encryption key for API keys."""
     # Use JWT secret as base for encryption key
@@ -278,6 +532,12 @@ def _get_encryption_key() -> bytes:
     return base64.urlsafe_b64encode(key_material)
 
 
+@lru_cache(maxsize=1)
+def _get_fernet() -> Fernet:
+    """Get the Fernet instance for keys stored before AES-GCM, built once."""
+    return Fernet(_get_encryption_key())
+
+
 def encrypt_api_key(plain_api_key: str) -> str:
     """
     Encrypt an API key for secure storage.
@@ -286,14 +546,14 @@ def encrypt_api_key(plain_api_key: str) -> str:
         plain_api_key: The plain text API key
         
     Returns:
-        str: The encrypted API key (base64 encoded)
+        str: The encrypted API key
     """
     if not plain_api_key:
         return ""
     
-    f = Fernet(_get_encryption_key())
-    encrypted_bytes = f.encrypt(plain_api_key.encode())
-    return base64.urlsafe_b64encode(encrypted_bytes).decode()
+    nonce = os.urandom(_API_KEY_NONCE_BYTES)
+    sealed = _get_aead().encrypt(nonce, plain_api_key.encode(), None)
+    return API_KEY_PREFIX + base64.urlsafe_b64encode(nonce + sealed).decode()
 
 
 def decrypt_api_key(encrypted_api_key: str) -> str:
@@ -301,19 +561,36 @@ def decrypt_api_key(encrypted_api_key: str) -> str:
     Decrypt an API key for use.
     
     Args:
-        encrypted_api_key: The encrypted API key (base64 encoded)
+        encrypted_api_key: The encrypted API key
         
     Returns:
-        str: The decrypted API key
+        str: The decrypted API key, or "" if an AES-GCM value fails to decrypt
     """
     if not encrypted_api_key:
         return ""
     
+    if encrypted_api_key.startswith(API_KEY_PREFIX):
+        try:
+            raw = base64.urlsafe_b64decode(encrypted_api_key[len(API_KEY_PREFIX):].encode())
+            return _get_aead().decrypt(
+                raw[:_API_KEY_NONCE_BYTES], raw[_API_KEY_NONCE_BYTES:], None
+            ).decode()
+        except Exception as e:
+            # A tagged value is never a plain key; don't hand the ciphertext
+            # to a provider as a credential
+            logger.error("API key decryption failed", error=str(e) or type(e).__name__)
+            return ""
+    
+    # Fernet tokens, stored before the switch to AES-GCM
+    f = _get_fernet()
+    try:
+        return f.decrypt(encrypted_api_key.encode()).decode()
+    except Exception:
+        pass
+    
     try:
-        f = Fernet(_get_encryption_key())
-        encrypted_bytes = base64.urlsafe_b64decode(encrypted_api_key.encode())
-        decrypted_bytes = f.decrypt(encrypted_bytes)
-        return decrypted_bytes.decode()
+        # Keys stored before the format change carry an extra base64 layer
+        return f.decrypt(base64.urlsafe_b64decode(encrypted_api_key.encode())).decode()
     except Exception as e:
         # If decryption fails, it might be a plain text key (for backward compatibility)
         # In production, you might want to handle this differently
@@ -7,6 +7,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from core.config import settings
 
 # Import logging after settings to avoid circular imports
@@ -33,23 +34,32 @@ ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{
 logger.info("Database configuration loaded", 
            host=DB_HOST, port=DB_PORT, database=DB_NAME, user=DB_USER)
 
+# Connection pool options shared by both engines
+if settings.db_pool_mode == "null":
+    POOL_OPTIONS = {"poolclass": NullPool}
+else:
+    POOL_OPTIONS = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_pre_ping": True,
+        "pool_recycle": 3600,
+        # Reuse the most recently returned connection so that idle extras
+        # can age out under light load
+        "pool_use_lifo": True,
+    }
+
 # Create SQLAlchemy engines
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    pool_size=10,
-    max_overflow=20,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=settings.enable_sql_logging  # Enable SQL logging based on settings
+    echo=settings.enable_sql_logging,  # Enable SQL logging based on settings
+    **POOL_OPTIONS
 )
 
 async_engine = create_async_engine(
     ASYNC_SQLALCHEMY_DATABASE_URL,
-    pool_size=10,
-    max_overflow=20,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=settings.enable_sql_logging  # Enable SQL logging based on settings
+    echo=settings.enable_sql_logging,  # Enable SQL logging based on settings
+    **POOL_OPTIONS
 )
 
 # Create SessionLocal classes
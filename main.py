@@ -15,15 +15,14 @@ logger = get_logger("main")
 
 from db_config import get_async_db
 from models.models import Base, User, AiApiKey, AiProviderEnum
-from app import app
-from core.security import get_password_hash, encrypt_api_key
+from app import app, add_startup_task
+from core.security import get_password_hash_async, encrypt_api_key
 from core.config import settings
 from sqlalchemy import select
 
 os.makedirs("cache", exist_ok=True)
 
 
-@app.on_event("startup")
 async def startup_db_client():
     """Initialize database and default users on startup."""
     logger.info("Starting database initialization")
@@ -55,7 +54,7 @@ async def startup_db_client():
                     admin_user = User(
                         username=admin_username,
                         email=admin_email,
-                        password_hash=get_password_hash(admin_password),
+                        password_hash=await get_password_hash_async(admin_password),
                         first_name="Admin",
                         last_name="User",
                         role="admin",
@@ -70,7 +69,7 @@ async def startup_db_client():
                     )
                 elif force_reset_admin:
                     logger.info("Resetting admin user password", username=admin_username)
-                    admin_user.password_hash = get_password_hash(admin_password)
+                    admin_user.password_hash = await get_password_hash_async(admin_password)
                     await db.commit()
                     logger.info("Admin user password reset successfully")
 
@@ -84,7 +83,7 @@ async def startup_db_client():
                     free_user = User(
                         username=free_username,
                         email=free_email,
-                        password_hash=get_password_hash(free_password),
+                        password_hash=await get_password_hash_async(free_password),
                         first_name="Free",
                         last_name="User",
                         role="user",
@@ -99,7 +98,7 @@ async def startup_db_client():
                     )
                 elif force_reset_free:
                     logger.info("Resetting free user password", username=free_username)
-                    free_user.password_hash = get_password_hash(free_password)
+                    free_user.password_hash = await get_password_hash_async(free_password)
                     await db.commit()
                     logger.info("Free user password reset successfully")
 
@@ -137,6 +136,9 @@ async def startup_db_client():
         )
 
 
+add_startup_task(app, startup_db_client)
+
+
 # Run the application
 if __name__ == "__main__":
     # Export OpenAPI schema to a JSON file
@@ -155,6 +157,8 @@ if __name__ == "__main__":
         "app:app",
         host="0.0.0.0",
         port=8000,
+        loop="uvloop",
+        http="httptools",
         reload=False,
         reload_excludes=["*.pyc", "*.log","*.db", "*.json"],
         reload_includes=["*.py"],
@@ -0,0 +1,97 @@
+"""Store API keys as plain Fernet tokens
+
+Revision ID: 4f1c2d7e9b3a
+Revises: 9ac4b8d313d5
+Create Date: 2026-10-17 10:12:31.482915
+
+"""
+from typing import Optional, Sequence, Union
+import base64
+import hashlib
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from core.config import settings
+
+# revision identifiers, used by Alembic.
+revision: str = '4f1c2d7e9b3a'
+down_revision: Union[str, None] = '9ac4b8d313d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+def _fernet() -> Fernet:
+    """Build the Fernet cipher the keys were encrypted with at this revision."""
+    # The JWT secret, padded or cut to 32 bytes
+    key_material = settings.jwt_secret_key.encode()[:32].ljust(32, b'0')
+    return Fernet(base64.urlsafe_b64encode(key_material))
+
+
+def _unwrap(fernet: Fernet, encrypted_api_key: str) -> Optional[str]:
+    """Return the inner Fernet token of a double-encoded key, or None."""
+    try:
+        token = base64.urlsafe_b64decode(encrypted_api_key.encode())
+        fernet.decrypt(token)
+    except Exception:
+        return None
+    return token.decode()
+
+
+def _open_aes_gcm(encrypted_api_key: str) -> Optional[bytes]:
+    """Decrypt a "v2:" AES-GCM value saved by later code, or return None."""
+    try:
+        raw = base64.urlsafe_b64decode(encrypted_api_key[len("v2:"):].encode())
+        aead = AESGCM(hashlib.sha256(settings.jwt_secret_key.encode()).digest())
+        return aead.decrypt(raw[:12], raw[12:], None)
+    except Exception:
+        return None
+
+
+def upgrade() -> None:
+    """Strip the extra base64 layer from stored API keys."""
+    bind = op.get_bind()
+    fernet = _fernet()
+    rows = bind.execute(sa.text("SELECT id, encrypted_api_key FROM ai_api_key")).fetchall()
+    for key_id, encrypted_api_key in rows:
+        token = _unwrap(fernet, encrypted_api_key)
+        if token is not None:
+            bind.execute(
+                sa.text("UPDATE ai_api_key SET encrypted_api_key = :value WHERE id = :id"),
+                {"value": token, "id": key_id},
+            )
+
+
+def downgrade() -> None:
+    """
+    Restore the extra base64 layer on stored API keys.
+    
+    Keys saved as "v2:" AES-GCM values since this revision are re-encrypted
+    with Fernet first, as the older code can only read Fernet tokens.
+    """
+    bind = op.get_bind()
+    fernet = _fernet()
+    rows = bind.execute(sa.text("SELECT id, encrypted_api_key FROM ai_api_key")).fetchall()
+    for key_id, encrypted_api_key in rows:
+        if not encrypted_api_key:
+            continue
+        if encrypted_api_key.startswith("v2:"):
+            plain = _open_aes_gcm(encrypted_api_key)
+            if plain is None:
+                logger.warning("Leaving API key %s unchanged: it does not decrypt with the current secret", key_id)
+                continue
+            token = fernet.encrypt(plain).decode()
+        elif encrypted_api_key.startswith("gAAAAA") and _unwrap(fernet, encrypted_api_key) is None:
+            token = encrypted_api_key
+        else:
+            # Only Fernet tokens were wrapped; leave anything else untouched
+            continue
+        bind.execute(
+            sa.text("UPDATE ai_api_key SET encrypted_api_key = :value WHERE id = :id"),
+            {"value": base64.urlsafe_b64encode(token.encode()).decode(), "id": key_id},
+        )
@@ -9,13 +9,14 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy import select, or_, and_
 
 from core.security import (
-    get_password_hash, 
-    verify_password, 
+    get_password_hash_async,
+    verify_password_async,
     create_access_token,
     get_current_user,
     get_current_active_user,
     create_token,
-    verify_token
+    verify_token,
+    forget_user_tokens
 )
 from core.config import settings
 from core.logging import get_logger
@@ -80,7 +81,7 @@ async def register_user(
         )
     
     # Hash the password
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     # Create new user
     db_user = User(
@@ -174,7 +175,7 @@ async def login_user(login_data: LoginRequest, db: AsyncSession = Depends(get_as
     user_result = await db.execute(user_stmt)
     user = user_result.scalar_one_or_none()
     
-    if not user or not verify_password(login_data.password, user.password_hash):
+    if not user or not await verify_password_async(login_data.password, user.password_hash):
         logger.warning("Login failed - invalid credentials", username_or_email=login_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -220,6 +221,7 @@ async def login_user(login_data: LoginRequest, db: AsyncSession = Depends(get_as
         logger.debug("Created new user session", username=user.username, user_id=user.id)
     
     await db.commit()
+    forget_user_tokens(user.id)
     
     logger.info("Login successful", 
                username=user.username, 
@@ -262,6 +264,7 @@ async def logout_user(current_user: User = Depends(get_current_active_user), db:
     if session:
         await db.delete(session)
         await db.commit()
+        forget_user_tokens(current_user.id)
         logger.info("User session deleted", username=current_user.username, user_id=current_user.id)
     else:
         logger.warning("No session found for logout", username=current_user.username, user_id=current_user.id)
@@ -341,6 +344,7 @@ async def refresh_token(current_user: User = Depends(get_current_user), db: Asyn
         session.updated_at = datetime.now(timezone.utc)
         session.expires_at = datetime.now(timezone.utc) + access_token_expires
         await db.commit()
+        forget_user_tokens(current_user.id)
     
     return Token(
         access_token=access_token,
@@ -439,7 +443,7 @@ async def confirm_password_reset(
         )
     
     # Hash the new password
-    new_password_hash = get_password_hash(reset_confirm.new_password)
+    new_password_hash = await get_password_hash_async(reset_confirm.new_password)
     
     # Update the password
     user.password_hash = new_password_hash
@@ -454,6 +458,7 @@ async def confirm_password_reset(
         await db.delete(session)
     
     await db.commit()
+    forget_user_tokens(user.id)
     
     logger.info("Password reset successful", username=user.username, user_id=user.id)
     
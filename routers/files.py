@@ -37,15 +37,8 @@ async def upload_file(
             detail=f"Unsupported file type. Allowed types: PDF, TXT, DOCX, DOC"
         )
     
-    # Get file content for validation and hashing
-    file_content = await file.read()
-    file_size = len(file_content)
-    
-    # Reset file position for later use
-    await file.seek(0)
-    
-    # Validate file size
-    if not validate_file_size(file_size):
+    # Validate file size (tracked by the multipart parser, no need to read the body)
+    if not validate_file_size(file.size or 0):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"File too large. Maximum size: 50MB"
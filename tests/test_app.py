@@ -0,0 +1,73 @@
+"""
+Tests for the application factory in app.py.
+"""
+import sys
+import os
+import importlib
+from datetime import datetime, timezone
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import ROUTER_MODULES, create_app, health_check, root
+from core.security import get_current_active_user
+from models.models import User
+
+
+def build_eager_app(names=ROUTER_MODULES) -> FastAPI:
+    """Build the app the straightforward way, including each router with include_router."""
+    app = FastAPI(
+        title="Study Helper Backend API",
+        description="Backend API for the Study Helper application with AI-powered features",
+        version="0.1.0",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        default_response_class=ORJSONResponse,
+    )
+    for name in names:
+        app.include_router(importlib.import_module(f"routers.{name}").router)
+    app.add_api_route("/health", health_check, methods=["GET"], tags=["Health"], response_model=None)
+    app.add_api_route("/", root, methods=["GET"], tags=["Root"], response_model=None)
+    return app
+
+
+def route_set(app: FastAPI):
+    return sorted(
+        (route.path, tuple(sorted(route.methods)), route.name)
+        for route in app.routes if isinstance(route, APIRoute)
+    )
+
+
+def test_full_app_matches_eager_build():
+    app, eager = create_app(), build_eager_app()
+    assert route_set(app) == route_set(eager)
+    assert app.openapi() == eager.openapi()
+
+
+def test_subset_app_matches_eager_build():
+    app, eager = create_app(include=["auth", "users"]), build_eager_app(("auth", "users"))
+    assert route_set(app) == route_set(eager)
+    assert app.openapi() == eager.openapi()
+    assert not any(path.startswith("/files") for path, _, _ in route_set(app))
+
+
+def test_dependency_overrides_apply_per_app():
+    user = User(
+        id=7, username="override", first_name="O", last_name="R", email="override@example.com",
+        is_active=True, is_verified=True, role="user",
+        created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc),
+    )
+    overridden, plain = create_app(include=["auth"]), create_app(include=["auth"])
+    overridden.dependency_overrides[get_current_active_user] = lambda: user
+
+    response = TestClient(overridden).get("/auth/me")
+    assert response.status_code == 200
+    assert response.json()["username"] == "override"
+
+    # The other app shares the prebuilt routes but not the override
+    assert TestClient(plain).get("/auth/me").status_code in (401, 403)
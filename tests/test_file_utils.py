@@ -0,0 +1,23 @@
+"""
+Tests for the upload helpers in core.file_utils.
+"""
+import sys
+import os
+import io
+import stat
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.file_utils import _write_upload
+
+
+def test_upload_gets_same_mode_as_a_plain_write(tmp_path):
+    file_path, _, file_size = _write_upload(io.BytesIO(b"hello"), str(tmp_path), ".txt")
+    assert file_size == 5
+    assert not list(tmp_path.glob("*.part"))
+
+    reference = tmp_path / "reference.txt"
+    with open(reference, "wb") as f:
+        f.write(b"hello")
+    assert stat.S_IMODE(os.stat(file_path).st_mode) == stat.S_IMODE(reference.stat().st_mode)
@@ -0,0 +1,83 @@
+"""
+Tests for the log formatters and handlers in core.logging.
+"""
+import sys
+import os
+import io
+import json
+import logging
+
+import zstandard
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.logging import (
+    CachedTimeFormatter, CompressedRotatingFileHandler, PrebuiltJsonFormatter,
+    _wait_for_compression,
+)
+
+
+def _capture(logger_name: str, formatter: logging.Formatter):
+    """Attach a formatter-backed stream handler to a fresh logger."""
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(formatter)
+    logger = logging.getLogger(logger_name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger, stream
+
+
+def test_component_defaults_from_logger_name():
+    """Records get the component of their logger when none is passed."""
+    logger, stream = _capture("sqlalchemy.engine.test", CachedTimeFormatter("[%(component)s] %(message)s"))
+    logger.warning("hi")
+    assert stream.getvalue() == "[database] hi\n"
+
+    logger, stream = _capture("tests.component.default", PrebuiltJsonFormatter("%(component)s %(message)s"))
+    logger.warning("hi")
+    assert json.loads(stream.getvalue()) == {"component": "unknown", "message": "hi"}
+
+
+def test_component_can_be_overridden_through_extra():
+    """An explicit component in extra wins over the default."""
+    logger, stream = _capture("tests.component.text", CachedTimeFormatter("[%(component)s] %(message)s"))
+    logger.warning("hi", extra={"component": "billing"})
+    assert stream.getvalue() == "[billing] hi\n"
+
+    logger, stream = _capture("tests.component.json", PrebuiltJsonFormatter("%(component)s %(message)s"))
+    logger.warning("hi", extra={"component": "billing"})
+    assert json.loads(stream.getvalue())["component"] == "billing"
+
+
+def test_rollover_replaces_rotated_file_with_zst(tmp_path):
+    """Each rotated file ends up only as a .zst archive of its contents."""
+    log_file = tmp_path / "app.log"
+    handler = CompressedRotatingFileHandler(
+        filename=str(log_file), maxBytes=64, backupCount=2, compress_logs=True
+    )
+    logger, _ = _capture("tests.rollover", logging.Formatter("%(message)s"))
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.handlers = [handler]
+
+    try:
+        logger.info("first " + "a" * 60)
+        logger.info("second " + "b" * 60)
+        _wait_for_compression()
+
+        assert not (tmp_path / "app.log.1").exists()
+        archive = (tmp_path / "app.log.1.zst").read_bytes()
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(archive) == \
+            ("first " + "a" * 60 + "\n").encode()
+        assert log_file.read_text() == "second " + "b" * 60 + "\n"
+
+        # A further rollover shifts the archive along
+        logger.info("third " + "c" * 60)
+        _wait_for_compression()
+        assert sorted(path.name for path in tmp_path.iterdir()) == [
+            "app.log", "app.log.1.zst", "app.log.2.zst"
+        ]
+    finally:
+        handler.close()
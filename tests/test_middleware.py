@@ -0,0 +1,64 @@
+"""
+Tests for the ASGI middleware in core.middleware.
+"""
+import sys
+import os
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.middleware import setup_middleware
+
+
+@pytest.fixture
+def client():
+    """An app behind the standard middleware, with small size and time limits."""
+    app = FastAPI()
+    setup_middleware(app, {"max_request_size": 16, "timeout_seconds": 0.2})
+
+    @app.get("/ping")
+    async def ping(request: Request):
+        return {"request_id": request.state.request_id}
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(5)
+        return {"done": True}
+
+    return TestClient(app)
+
+
+def test_request_id_header_matches_request_state(client):
+    first, second = client.get("/ping"), client.get("/ping")
+    assert first.status_code == 200
+    request_id = first.headers["x-request-id"]
+    assert request_id == first.json()["request_id"]
+    assert len(request_id) == 22
+    assert second.headers["x-request-id"] != request_id
+    assert float(first.headers["x-process-time"]) >= 0
+    assert first.headers["x-content-type-options"] == "nosniff"
+
+
+def test_oversized_body_is_rejected_with_413(client):
+    assert client.post("/echo", content=b"x" * 16).json() == {"size": 16}
+
+    response = client.post("/echo", content=b"x" * 17)
+    assert response.status_code == 413
+    assert "Request body too large" in response.text
+    # Rejections still pass through the logging and security header middleware
+    assert "x-request-id" in response.headers
+
+
+def test_slow_request_times_out_with_504(client):
+    response = client.get("/slow")
+    assert response.status_code == 504
+    assert "Request timeout" in response.text
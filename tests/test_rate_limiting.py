@@ -0,0 +1,165 @@
+"""
+Tests for the in-memory and Redis rate limiters in core.rate_limiting.
+"""
+import sys
+import os
+import types
+import threading
+
+import pytest
+from starlette.requests import Request
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import core.rate_limiting as rate_limiting
+from core.rate_limiting import IDLE_EXPIRY_SECONDS, RateLimiter, RedisRateLimiter
+
+
+class FakeClock:
+    """Stands in for the time module with a clock the test moves by hand."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiting, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def limiter(clock):
+    limiter = RateLimiter()
+    limiter.policies["test"] = {"requests": 3, "window": 10}
+    return limiter
+
+
+def make_request(ip: str = "203.0.113.7") -> Request:
+    return Request({"type": "http", "headers": [], "client": (ip, 1234), "state": {}})
+
+
+def test_blocks_at_limit_until_window_expires(limiter, clock):
+    request = make_request()
+    for remaining in (2, 1, 0):
+        allowed, info = limiter.is_allowed(request, "test")
+        assert allowed and info["requests_remaining"] == remaining
+
+    allowed, info = limiter.is_allowed(request, "test")
+    assert not allowed
+    assert info["retry_after"] == 10
+
+    clock.now += 10.001
+    allowed, info = limiter.is_allowed(request, "test")
+    assert allowed and info["requests_remaining"] == 2
+
+
+def test_window_slides_one_request_at_a_time(limiter, clock):
+    request = make_request()
+    start = clock.now
+    for offset in (0, 5, 6):
+        clock.now = start + offset
+        assert limiter.is_allowed(request, "test")[0]
+
+    # Only the request made at 0 has left the window
+    clock.now = start + 10.5
+    assert limiter.is_allowed(request, "test")[0]
+    allowed, info = limiter.is_allowed(request, "test")
+    assert not allowed and info["retry_after"] == 4
+
+    clock.now = start + 15.5
+    assert limiter.is_allowed(request, "test")[0]
+
+
+def test_ring_buffer_wraps_around(limiter, clock):
+    request = make_request()
+    for _ in range(10):
+        for _ in range(3):
+            assert limiter.is_allowed(request, "test")[0]
+        assert not limiter.is_allowed(request, "test")[0]
+        clock.now += 11
+
+    state = limiter.storage[("test", ("ip", "203.0.113.7"))]
+    assert state.head == 0
+    info = limiter.get_rate_limit_info(request, "test")
+    assert info["current_count"] == 0 and not info["blocked"]
+
+
+def test_idle_keys_are_evicted_by_the_wheel(limiter, clock):
+    idle, active = make_request("198.51.100.1"), make_request("198.51.100.2")
+    limiter.is_allowed(idle, "test")
+    limiter.is_allowed(active, "test")
+
+    # Keep one client busy while the other goes quiet
+    clock.now += IDLE_EXPIRY_SECONDS / 2
+    limiter.is_allowed(active, "test")
+    clock.now += IDLE_EXPIRY_SECONDS / 2 + 2
+
+    assert limiter.cleanup_expired() == 1
+    assert list(limiter.storage) == [("test", ("ip", "198.51.100.2"))]
+
+    clock.now += IDLE_EXPIRY_SECONDS
+    assert limiter.cleanup_expired() == 1
+    assert not limiter.storage
+
+
+def test_concurrent_requests_never_exceed_limit(clock):
+    limiter = RateLimiter()
+    limiter.policies["test"] = {"requests": 50, "window": 60}
+    request = make_request()
+    results = []
+
+    def hammer():
+        for _ in range(100):
+            results.append(limiter.is_allowed(request, "test")[0])
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 50
+
+
+class FakeRedisError(Exception):
+    pass
+
+
+class UnreachableRedis:
+    """A redis client whose every command fails as if the server were down."""
+
+    def register_script(self, script):
+        def run(keys, args):
+            raise FakeRedisError("connection refused")
+        return run
+
+    def pipeline(self):
+        class Pipeline:
+            def get(self, key):
+                pass
+
+            def pttl(self, key):
+                pass
+
+            def execute(self):
+                raise FakeRedisError("connection refused")
+
+        return Pipeline()
+
+
+def test_redis_outage_falls_back_to_memory(clock, monkeypatch):
+    monkeypatch.setitem(sys.modules, "redis", types.SimpleNamespace(RedisError=FakeRedisError))
+    limiter = RedisRateLimiter(UnreachableRedis())
+    request = make_request()
+
+    results = [limiter.is_allowed(request, "auth")[0] for _ in range(11)]
+    assert results == [True] * 10 + [False]
+
+    info = limiter.get_rate_limit_info(request, "auth")
+    assert info["current_count"] == 10 and info["blocked"]
@@ -0,0 +1,211 @@
+"""
+Tests for the authentication caches in core.security.
+"""
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import bcrypt
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, delete, event
+from sqlalchemy.orm import Session
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import core.security as security
+from models.models import User, UserSession
+
+
+class SyncSessionAdapter:
+    """Expose the AsyncSession methods get_current_user uses over a sync Session."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def execute(self, statement, params=None):
+        return self.session.execute(statement, params)
+
+    async def merge(self, instance, load=True):
+        return self.session.merge(instance, load=load)
+
+
+@pytest.fixture
+def engine():
+    """An in-memory database holding one user with a live session."""
+    engine = create_engine("sqlite://")
+    User.__table__.create(engine)
+    UserSession.__table__.create(engine)
+    engine.statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: engine.statements.append(args[2]))
+    yield engine
+    security._token_cache.clear()
+    security._user_token_keys.clear()
+    security._payload_cache.clear()
+
+
+def _login(engine, username="alice"):
+    """Create a user and a session, returning the user id and bearer credentials."""
+    token = security.create_access_token({"sub": username})
+    with Session(engine) as session:
+        user = User(
+            username=username, first_name="A", last_name="B", email=f"{username}@example.com",
+            password_hash="x", is_active=True, is_verified=True, role="user",
+        )
+        session.add(user)
+        session.flush()
+        session.add(UserSession(
+            user_id=user.id, session_token=token,
+            expires_at=datetime.now(timezone.utc) + timedelta(minutes=5),
+        ))
+        session.commit()
+        return user.id, SimpleNamespace(credentials=token)
+
+
+def _authenticate(engine, credentials):
+    with Session(engine) as session:
+        user = asyncio.run(security.get_current_user(credentials, SyncSessionAdapter(session)))
+        return user.username
+
+
+def _revoke_sessions(engine):
+    """Delete every session row, as a logout handled by another worker would."""
+    with Session(engine) as session:
+        session.execute(delete(UserSession))
+        session.commit()
+
+
+def test_revoked_session_is_rejected_by_default(engine):
+    """Without the auth cache every request checks the session row."""
+    assert security.TOKEN_CACHE_TTL == 0
+    _, credentials = _login(engine)
+    assert _authenticate(engine, credentials) == "alice"
+    assert not security._token_cache
+
+    _revoke_sessions(engine)
+    with pytest.raises(HTTPException) as exc_info:
+        _authenticate(engine, credentials)
+    assert exc_info.value.status_code == 401
+
+
+def test_cached_authentication_is_dropped_on_logout(engine, monkeypatch):
+    """With the auth cache on, forgetting the user's tokens forces a fresh check."""
+    monkeypatch.setattr(security, "TOKEN_CACHE_TTL", 30)
+    user_id, credentials = _login(engine)
+    assert _authenticate(engine, credentials) == "alice"
+
+    # Served from the cache without touching the database
+    engine.statements.clear()
+    assert _authenticate(engine, credentials) == "alice"
+    assert engine.statements == []
+
+    # Logout deletes the session and forgets the cached authentication
+    _revoke_sessions(engine)
+    security.forget_user_tokens(user_id)
+    with pytest.raises(HTTPException) as exc_info:
+        _authenticate(engine, credentials)
+    assert exc_info.value.status_code == 401
+
+
+def test_forget_user_tokens_only_drops_that_user(engine):
+    """Every cached token of the user goes; other users' entries stay."""
+    for index in range(3):
+        security._cache_token(b"alice%d" % index, 1, float("inf"), {})
+    security._cache_token(b"bob", 2, float("inf"), {})
+
+    security.forget_user_tokens(1)
+
+    assert list(security._token_cache) == [b"bob"]
+    assert security._user_token_keys == {2: {b"bob"}}
+
+
+def test_lru_eviction_prunes_user_index(engine, monkeypatch):
+    """Entries evicted from the cache leave the per-user index too."""
+    monkeypatch.setattr(security, "TOKEN_CACHE_SIZE", 2)
+    for user_id in range(1, 6):
+        security._cache_token(b"token%d" % user_id, user_id, float("inf"), {})
+
+    assert list(security._token_cache) == [b"token4", b"token5"]
+    assert security._user_token_keys == {4: {b"token4"}, 5: {b"token5"}}
+
+
+@pytest.fixture
+def password_cache(monkeypatch):
+    """An empty password cache, counting the bcrypt checks made."""
+    security._password_cache.clear()
+    checks = []
+    checkpw = bcrypt.checkpw
+
+    def counting_checkpw(password, hashed):
+        checks.append(password)
+        return checkpw(password, hashed)
+
+    monkeypatch.setattr(security.bcrypt, "checkpw", counting_checkpw)
+    yield checks
+    security._password_cache.clear()
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=4)).decode()
+
+
+def test_successful_password_check_is_cached(password_cache):
+    hashed = _hash("correct horse")
+    assert security.verify_password("correct horse", hashed)
+    assert security.verify_password("correct horse", hashed)
+    assert len(password_cache) == 1
+
+
+def test_wrong_password_is_never_served_from_cache(password_cache):
+    hashed = _hash("correct horse")
+    assert not security.verify_password("battery staple", hashed)
+    assert not security._password_cache
+
+    # A cached success for the right password does not vouch for a wrong one
+    assert security.verify_password("correct horse", hashed)
+    assert not security.verify_password("battery staple", hashed)
+    assert len(password_cache) == 3
+
+
+def test_changed_password_hash_invalidates_cache(password_cache):
+    old_hash = _hash("correct horse")
+    assert security.verify_password("correct horse", old_hash)
+
+    # After a password change the stored hash is new, so the old password
+    # is checked against it with bcrypt and rejected
+    new_hash = _hash("battery staple")
+    assert not security.verify_password("correct horse", new_hash)
+    assert security.verify_password("battery staple", new_hash)
+    assert len(password_cache) == 3
+
+
+def test_api_key_round_trip():
+    encrypted = security.encrypt_api_key("sk-test-1234")
+    assert encrypted.startswith(security.API_KEY_PREFIX)
+    assert "sk-test-1234" not in encrypted
+    assert security.decrypt_api_key(encrypted) == "sk-test-1234"
+
+
+def test_api_key_under_wrong_key_is_not_returned(monkeypatch):
+    encrypted = security.encrypt_api_key("sk-test-1234")
+
+    # As if the secret changed since the key was stored
+    monkeypatch.setattr(security, "_get_aead", lambda: security.AESGCM(b"\0" * 32))
+    assert security.decrypt_api_key(encrypted) == ""
+
+    # Tampered ciphertext is rejected the same way
+    monkeypatch.undo()
+    assert security.decrypt_api_key(encrypted[:-4] + "AAAA") == ""
+
+
+def test_only_access_tokens_use_the_payload_cache(engine):
+    reset_token = security.create_token({"sub": "alice", "type": "password_reset"})
+    assert security.verify_token(reset_token)["type"] == "password_reset"
+    assert not security._payload_cache
+
+    _, credentials = _login(engine)
+    assert _authenticate(engine, credentials) == "alice"
+    assert list(security._payload_cache) == [security._token_cache_key(credentials.credentials)]